@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from build_cache import toolchain_versions
+from run_corpus import (
+    SAVE_PROFILE_NAMES,
+    Fixture,
+    discover_fixtures,
+    select_fixtures,
+    with_profiles,
+)
+
+
+HISTORY_PATH = Path("output/.bench_history.jsonl")
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+# Timing differences below this are noise for sub-millisecond fixtures.
+MIN_TIME_DELTA_S = 0.001
+COMPARED_METRICS = ("construct_s", "save_s", "peak_rss_kb", "pss_kb", "objects", "bytes")
+MEMORY_METRICS = ("peak_rss_kb", "pss_kb")
+SMAPS_ROLLUP_PATH = Path("/proc/self/smaps_rollup")
+
+
+def proportional_set_size_kb() -> int | None:
+    # Resident memory with each shared page (an mmap'd font, shared
+    # libraries) split among the processes mapping it, which is what adding a
+    # worker costs; ru_maxrss counts shared pages in full. Linux only.
+    try:
+        rollup = SMAPS_ROLLUP_PATH.read_text()
+    except OSError:
+        return None
+    for line in rollup.splitlines():
+        if line.startswith("Pss:"):
+            return int(line.split()[1])
+    return None
+
+
+def measure(fixture: Fixture, repeat: int) -> dict:
+    # Runs in a fresh process per fixture, so ru_maxrss is this fixture's
+    # peak. The first iteration pays the cold font and skeleton caches and
+    # is reported separately; the medians cover the warm iterations.
+    from save_profiles import active_profile, save_pdf
+
+    module = importlib.import_module(fixture.module)
+    construct = []
+    save = []
+    pss = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf = module.make_pdf(**fixture.params)
+        built = time.perf_counter()
+        buffer = io.BytesIO()
+        with active_profile(fixture.profile):
+            save_pdf(pdf, buffer, deterministic_id=True)
+        saved = time.perf_counter()
+        construct.append(built - start)
+        save.append(saved - built)
+        # Sampled while the document is still open, at its largest.
+        sample = proportional_set_size_kb()
+        if sample is not None:
+            pss = max(pss or 0, sample)
+        objects = len(pdf.objects)
+        size = buffer.tell()
+        pdf.close()
+    warm_construct = construct[1:] or construct
+    warm_save = save[1:] or save
+    return {
+        "cold_s": construct[0] + save[0],
+        "construct_s": statistics.median(warm_construct),
+        "save_s": statistics.median(warm_save),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "pss_kb": pss,
+        "objects": objects,
+        "bytes": size,
+        "profile": fixture.profile,
+    }
+
+
+def run_benchmarks(fixtures: list[Fixture], repeat: int, jobs: int) -> dict[str, dict]:
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=max(jobs, 1), mp_context=context, max_tasks_per_child=1
+    ) as executor:
+        futures = [(fixture, executor.submit(measure, fixture, repeat)) for fixture in fixtures]
+        for fixture, future in futures:
+            metrics = future.result()
+            results[str(fixture.output_path)] = metrics
+            print(
+                f"{metrics['construct_s'] * 1000:9.1f} ms build "
+                f"{metrics['save_s'] * 1000:9.1f} ms save "
+                f"{metrics['peak_rss_kb'] / 1024:8.1f} MB "
+                f"{(metrics['pss_kb'] or 0) / 1024:8.1f} MB pss "
+                f"{metrics['objects']:9d} obj "
+                f"{metrics['bytes']:11d} B  {fixture.output_path}"
+            )
+    return results
+
+
+def load_history(history_path: Path) -> list[dict]:
+    if not history_path.exists():
+        return []
+    with history_path.open() as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def append_history(record: dict, history_path: Path) -> None:
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with history_path.open("a") as handle:
+        handle.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def find_baseline(history: list[dict], label: str | None) -> dict | None:
+    for record in reversed(history):
+        if label is None or record.get("label") == label:
+            return record
+    return None
+
+
+def regressions(baseline: dict, current: dict, threshold: float) -> list[str]:
+    found = []
+    for output, metrics in current["results"].items():
+        before = baseline["results"].get(output)
+        if before is None or before.get("profile") != metrics["profile"]:
+            continue
+        for metric in COMPARED_METRICS:
+            # Runs recorded before a metric existed, or without /proc, lack it.
+            old, new = before.get(metric), metrics.get(metric)
+            if old is None or new is None or new <= old * (1 + threshold):
+                continue
+            if metric.endswith("_s") and new - old < MIN_TIME_DELTA_S:
+                continue
+            change = (new - old) / old * 100 if old else float("inf")
+            found.append(f"{output}: {metric} {old:.6g} -> {new:.6g} (+{change:.1f}%)")
+    return found
+
+
+def memory_changes(baseline: dict, current: dict) -> list[str]:
+    # Per-worker memory before and after, improvements included: each
+    # fixture is measured in its own worker process.
+    lines = []
+    for output, metrics in current["results"].items():
+        before = baseline["results"].get(output)
+        if before is None or before.get("profile") != metrics["profile"]:
+            continue
+        changes = []
+        for metric in MEMORY_METRICS:
+            old, new = before.get(metric), metrics.get(metric)
+            if old is not None and new is not None:
+                changes.append(f"{metric} {old / 1024:.1f} -> {new / 1024:.1f} MB")
+        if changes:
+            lines.append(f"{output}: {', '.join(changes)}")
+    return lines
+
+
+def positive_int(text: str) -> int:
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark fixture construction, save time, memory and output size.",
+    )
+    parser.add_argument(
+        "-r",
+        "--rule",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="only benchmark fixtures whose rule ID matches PATTERN (may be repeated)",
+    )
+    parser.add_argument(
+        "--stress",
+        action="store_true",
+        help="include the generators' STRESS_FIXTURES parameterizations",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=(*SAVE_PROFILE_NAMES, "matrix"),
+        help="save with this serialization profile, or 'matrix' for each of them",
+    )
+    parser.add_argument(
+        "-n",
+        "--repeat",
+        type=positive_int,
+        default=DEFAULT_REPEAT,
+        help=f"builds per fixture (default: {DEFAULT_REPEAT})",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="fixtures measured concurrently (default: 1, for stable timings)",
+    )
+    parser.add_argument(
+        "--history",
+        type=Path,
+        default=HISTORY_PATH,
+        help=f"benchmark history location (default: {HISTORY_PATH})",
+    )
+    parser.add_argument(
+        "--label",
+        help="name this run in the history, e.g. a branch or commit",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="compare against the previous run and exit 1 on regressions",
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="LABEL",
+        help="compare against the latest run with this label instead",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"relative increase reported as a regression (default: {DEFAULT_THRESHOLD})",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    fixtures = select_fixtures(discover_fixtures(stress=args.stress), args.rule)
+    if args.profile:
+        fixtures = with_profiles(fixtures, args.profile)
+    history = load_history(args.history)
+
+    pikepdf_version, qpdf_version = toolchain_versions()
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "label": args.label,
+        "python": platform.python_version(),
+        "pikepdf": pikepdf_version,
+        "qpdf": qpdf_version,
+        "repeat": args.repeat,
+        "results": run_benchmarks(fixtures, args.repeat, args.jobs),
+    }
+    append_history(record, args.history)
+
+    if not (args.compare or args.baseline):
+        return 0
+    baseline = find_baseline(history, args.baseline)
+    if baseline is None:
+        print("no baseline run to compare against", file=sys.stderr)
+        return 0
+    for line in memory_changes(baseline, record):
+        print(f"MEMORY {line}")
+    found = regressions(baseline, record, args.threshold)
+    for line in found:
+        print(f"REGRESSION {line}")
+    print(
+        f"compared {len(record['results'])} fixtures against "
+        f"{baseline.get('label') or baseline['timestamp']}: {len(found)} regression(s)"
+    )
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import ast
+import hashlib
+import json
+import os
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parent
+MANIFEST_PATH = Path("output/.build_manifest.jsonl")
+
+
+@lru_cache(maxsize=None)
+def local_dependencies(module: str) -> tuple[str, ...]:
+    # The generator plus every sibling module it (transitively) imports, so
+    # edits to shared helpers such as font_subset invalidate their users.
+    seen = []
+    pending = [module]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        source_path = ROOT_DIR / f"{name}.py"
+        if not source_path.exists():
+            continue
+        seen.append(name)
+        tree = ast.parse(source_path.read_text(), filename=str(source_path))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                pending.append(node.module)
+    return tuple(sorted(seen))
+
+
+@lru_cache(maxsize=None)
+def _file_digest(path: Path, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    stat = path.stat()
+    return _file_digest(path, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=None)
+def toolchain_versions() -> tuple[str, str]:
+    import pikepdf
+
+    return pikepdf.__version__, pikepdf.__libqpdf_version__
+
+
+def fixture_key(module: str, params: dict) -> str:
+    dependencies = local_dependencies(module)
+    pikepdf_version, qpdf_version = toolchain_versions()
+    material = {
+        "sources": {name: file_digest(ROOT_DIR / f"{name}.py") for name in dependencies},
+        "params": params,
+        "pikepdf": pikepdf_version,
+        "qpdf": qpdf_version,
+    }
+    if "font_cache" in dependencies:
+        from font_cache import find_font_path
+
+        font_path = find_font_path()
+        material["fonts"] = {str(font_path): file_digest(font_path)}
+    encoded = json.dumps(material, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def load_manifest(manifest_path: Path = MANIFEST_PATH) -> dict[str, dict]:
+    # The manifest is an append-only journal; later lines win, and a line cut
+    # short by an interrupted run is ignored.
+    entries = {}
+    if not manifest_path.exists():
+        return entries
+    with manifest_path.open() as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["output"]] = entry
+    return entries
+
+
+def _file_state(path: Path) -> dict | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_up_to_date(
+    entries: dict[str, dict],
+    output_path: Path,
+    key: str,
+    companions: Iterable[Path] = (),
+) -> bool:
+    # ``companions`` are the other files the build writes (an answer file
+    # next to the PDF, say); a missing or changed one makes it stale too.
+    entry = entries.get(str(output_path))
+    if entry is None or entry["key"] != key:
+        return False
+    state = _file_state(output_path)
+    if state is None or (state["size"], state["mtime_ns"]) != (entry["size"], entry["mtime_ns"]):
+        return False
+    recorded = entry.get("companions", {})
+    return all(
+        str(path) in recorded and _file_state(path) == recorded[str(path)]
+        for path in companions
+    )
+
+
+def record_build(
+    entries: dict[str, dict],
+    output_path: Path,
+    key: str,
+    manifest_path: Path = MANIFEST_PATH,
+    companions: Iterable[Path] = (),
+) -> None:
+    stat = output_path.stat()
+    entry = {
+        "output": str(output_path),
+        "key": key,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    if companions:
+        entry["companions"] = {str(path): _file_state(path) for path in companions}
+    entries[entry["output"]] = entry
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with manifest_path.open("a") as handle:
+        handle.write(json.dumps(entry, sort_keys=True) + "\n")
+
+
+def compact_manifest(entries: dict[str, dict], manifest_path: Path = MANIFEST_PATH) -> None:
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = manifest_path.with_suffix(".tmp")
+    with temporary_path.open("w") as handle:
+        for output in sorted(entries):
+            handle.write(json.dumps(entries[output], sort_keys=True) + "\n")
+    os.replace(temporary_path, manifest_path)
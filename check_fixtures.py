@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pikepdf
+
+from build_cache import ROOT_DIR, file_digest, local_dependencies
+from cmap import parse_cmap
+from run_corpus import FIXTURE_NAME_RE
+
+
+OUTPUT_DIR = Path("output")
+CACHE_PATH = Path("output/.check_cache.json")
+
+
+def iter_struct_tree(pdf: pikepdf.Pdf) -> Iterator[pikepdf.Dictionary]:
+    # Every dictionary reachable through /K from the StructTreeRoot
+    # (StructElems, OBJRs and MCRs), each indirect object visited once.
+    if "/StructTreeRoot" not in pdf.Root:
+        return
+    visited = set()
+    stack = [pdf.Root.StructTreeRoot.get("/K")]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, pikepdf.Array):
+            stack.extend(reversed(list(node)))
+            continue
+        if not isinstance(node, pikepdf.Dictionary):
+            continue
+        if node.is_indirect:
+            if node.objgen in visited:
+                continue
+            visited.add(node.objgen)
+        yield node
+        if node.get("/Type") not in (pikepdf.Name("/OBJR"), pikepdf.Name("/MCR")):
+            stack.append(node.get("/K"))
+
+
+def cyclic_role_keys(role_map: dict[str, str]) -> set[str]:
+    # Each key maps to exactly one value, so walking from every unvisited key
+    # and stopping at the first node already seen finds every cycle in O(n).
+    on_cycle = set()
+    state = {}
+    for start in role_map:
+        if start in state:
+            continue
+        path = []
+        node = start
+        while node in role_map and node not in state:
+            state[node] = start
+            path.append(node)
+            node = role_map[node]
+        if state.get(node) == start:
+            on_cycle.update(path[path.index(node):])
+    return on_cycle
+
+
+def has_circular_role_mapping(pdf: pikepdf.Pdf) -> bool:
+    struct_tree_root = pdf.Root.get("/StructTreeRoot")
+    if struct_tree_root is None or "/RoleMap" not in struct_tree_root:
+        return False
+    role_map = {str(key): str(value) for key, value in struct_tree_root.RoleMap.items()}
+    return bool(cyclic_role_keys(role_map))
+
+
+def has_bad_note_id(pdf: pikepdf.Pdf) -> bool:
+    seen = set()
+    for node in iter_struct_tree(pdf):
+        if node.get("/S") != pikepdf.Name("/Note"):
+            continue
+        if "/ID" not in node:
+            return True
+        note_id = bytes(node.ID)
+        if note_id in seen:
+            return True
+        seen.add(note_id)
+    return False
+
+
+def has_unnamed_oc_config(pdf: pikepdf.Pdf) -> bool:
+    ocproperties = pdf.Root.get("/OCProperties")
+    if ocproperties is None:
+        return False
+    configs = list(ocproperties.get("/Configs", pikepdf.Array()))
+    if "/D" in ocproperties:
+        configs.append(ocproperties.D)
+    return any("/Name" not in config for config in configs)
+
+
+def iter_printermark_annotations(pdf: pikepdf.Pdf) -> Iterator[pikepdf.Dictionary]:
+    for page in pdf.pages:
+        for annotation in page.obj.get("/Annots", pikepdf.Array()):
+            if annotation.get("/Subtype") == pikepdf.Name("/PrinterMark"):
+                yield annotation
+
+
+def has_printermark_in_structure(pdf: pikepdf.Pdf) -> bool:
+    for node in iter_struct_tree(pdf):
+        if node.get("/Type") != pikepdf.Name("/OBJR"):
+            continue
+        target = node.get("/Obj")
+        if target is not None and target.get("/Subtype") == pikepdf.Name("/PrinterMark"):
+            return True
+    return False
+
+
+def _content_outside_artifact(stream: pikepdf.Stream) -> bool:
+    artifact_depth = 0
+    marked = []
+    for operands, operator in pikepdf.parse_content_stream(stream):
+        name = str(operator)
+        if name in ("BMC", "BDC"):
+            is_artifact = operands[0] == pikepdf.Name("/Artifact")
+            marked.append(is_artifact)
+            artifact_depth += is_artifact
+        elif name == "EMC":
+            if marked:
+                artifact_depth -= marked.pop()
+        elif artifact_depth == 0:
+            return True
+    return False
+
+
+def has_printermark_appearance_not_artifact(pdf: pikepdf.Pdf) -> bool:
+    for annotation in iter_printermark_annotations(pdf):
+        appearance = annotation.get("/AP", pikepdf.Dictionary()).get("/N")
+        if isinstance(appearance, pikepdf.Dictionary):
+            streams = [value for value in appearance.values() if isinstance(value, pikepdf.Stream)]
+        else:
+            streams = [appearance] if isinstance(appearance, pikepdf.Stream) else []
+        if any(_content_outside_artifact(stream) for stream in streams):
+            return True
+    return False
+
+
+def iter_type0_fonts(pdf: pikepdf.Pdf) -> Iterator[pikepdf.Dictionary]:
+    visited = set()
+    for page in pdf.pages:
+        fonts = page.obj.get("/Resources", pikepdf.Dictionary()).get("/Font", pikepdf.Dictionary())
+        for font in fonts.values():
+            if font.is_indirect:
+                if font.objgen in visited:
+                    continue
+                visited.add(font.objgen)
+            if font.get("/Subtype") == pikepdf.Name("/Type0"):
+                yield font
+
+
+def has_cidsysteminfo_mismatch(pdf: pikepdf.Pdf) -> bool:
+    for font in iter_type0_fonts(pdf):
+        cid_info = font.DescendantFonts[0].get("/CIDSystemInfo")
+        if cid_info is None:
+            continue
+        # The CMap side: the Encoding CMap stream and, where a generator
+        # put one there, the Type0 dictionary's own CIDSystemInfo.
+        others = [font.get("/CIDSystemInfo")]
+        encoding = font.get("/Encoding")
+        if isinstance(encoding, pikepdf.Stream):
+            others.append(encoding.get("/CIDSystemInfo"))
+        for other in others:
+            if other is None:
+                continue
+            if other.get("/Registry") != cid_info.get("/Registry"):
+                return True
+            if other.get("/Ordering") != cid_info.get("/Ordering"):
+                return True
+    return False
+
+
+def has_cmap_wmode_mismatch(pdf: pikepdf.Pdf) -> bool:
+    for font in iter_type0_fonts(pdf):
+        encoding = font.get("/Encoding")
+        if not isinstance(encoding, pikepdf.Stream):
+            continue
+        if int(encoding.get("/WMode", 0)) != parse_cmap(encoding.read_bytes()).wmode:
+            return True
+    return False
+
+
+ORACLES: dict[str, Callable[[pikepdf.Pdf], bool]] = {
+    "7.1-3": has_circular_role_mapping,
+    "7.9-2": has_bad_note_id,
+    "7.10-1": has_unnamed_oc_config,
+    "7.18.8-1": has_printermark_in_structure,
+    "7.18.8-2": has_printermark_appearance_not_artifact,
+    "7.21.3-1": has_cidsysteminfo_mismatch,
+    "7.21.3.3-1": has_cmap_wmode_mismatch,
+}
+
+
+def check_file(path: Path) -> bool:
+    rule = FIXTURE_NAME_RE.match(path.name)["rule"]
+    with pikepdf.open(path) as pdf:
+        return ORACLES[rule](pdf)
+
+
+def violated_rules(path: Path) -> list[str]:
+    with pikepdf.open(path) as pdf:
+        return [rule for rule, oracle in ORACLES.items() if oracle(pdf)]
+
+
+def checker_digest() -> str:
+    # Verdicts depend on this script and the helpers it imports (the CMap
+    # parser, for one).
+    digest = hashlib.sha256()
+    for name in local_dependencies(Path(__file__).stem):
+        digest.update(file_digest(ROOT_DIR / f"{name}.py").encode())
+    return digest.hexdigest()
+
+
+def load_cache(cache_path: Path) -> dict[str, dict]:
+    if not cache_path.exists():
+        return {}
+    return json.loads(cache_path.read_text())
+
+
+def save_cache(cache: dict[str, dict], cache_path: Path) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = cache_path.with_suffix(".tmp")
+    temporary_path.write_text(json.dumps(cache, sort_keys=True))
+    os.replace(temporary_path, cache_path)
+
+
+def find_fixtures(output_dir: Path) -> list[Path]:
+    return sorted(
+        path
+        for path in output_dir.rglob("*.pdf")
+        if (match := FIXTURE_NAME_RE.match(path.name)) and match["rule"] in ORACLES
+    )
+
+
+def unchecked_reason(path: Path) -> str | None:
+    match = FIXTURE_NAME_RE.match(path.name)
+    if match is None:
+        return "unrecognized fixture name"
+    if match["rule"] not in ORACLES:
+        return f"no oracle for rule {match['rule']}"
+    return None
+
+
+def check_fixtures(
+    paths: list[Path],
+    jobs: int,
+    cache_path: Path = CACHE_PATH,
+) -> dict[Path, bool]:
+    # The cache maps each fixture's resolved path to the checker and file
+    # digests its verdict was computed for. Entries from an older checker or
+    # for a file since deleted are dropped; every other entry is kept, so
+    # checking part of the corpus leaves the rest of the cache usable.
+    checker = checker_digest()
+    cache = {
+        key: entry
+        for key, entry in load_cache(cache_path).items()
+        if isinstance(entry, dict) and entry.get("checker") == checker and Path(key).exists()
+    }
+    keys = {path: str(path.resolve()) for path in paths}
+    with ProcessPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        digests = dict(zip(paths, executor.map(file_digest, paths)))
+        unchecked = [
+            path for path in paths if cache.get(keys[path], {}).get("digest") != digests[path]
+        ]
+        for path, violated in zip(unchecked, executor.map(check_file, unchecked)):
+            cache[keys[path]] = {"checker": checker, "digest": digests[path], "violated": violated}
+    save_cache(cache, cache_path)
+    return {path: cache[keys[path]]["violated"] for path in paths}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check that every fixture violates (fail) or satisfies (pass) its rule.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        type=Path,
+        default=[OUTPUT_DIR],
+        help="fixture files or directories to scan (default: output/)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="act as a validator stand-in: ignore the file names, report every "
+        "rule each file violates and exit 1 if any does",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=CACHE_PATH,
+        help=f"verdict cache location (default: {CACHE_PATH})",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.validate:
+        violated = False
+        paths = []
+        for path in args.paths:
+            if path.is_dir():
+                paths.extend(
+                    sorted(
+                        found
+                        for found in path.rglob("*.pdf")
+                        if FIXTURE_NAME_RE.match(found.name)
+                    )
+                )
+            else:
+                paths.append(path)
+        for path in paths:
+            rules = violated_rules(path)
+            violated = violated or bool(rules)
+            print(f"{path}: {'violates ' + ', '.join(rules) if rules else 'compliant'}")
+        return 1 if violated else 0
+
+    paths = []
+    for path in args.paths:
+        if path.is_dir():
+            paths.extend(find_fixtures(path))
+        elif reason := unchecked_reason(path):
+            print(f"SKIPPED {path}: {reason}")
+        else:
+            paths.append(path)
+
+    results = check_fixtures(paths, args.jobs, args.cache)
+    wrong = 0
+    for path, violated in results.items():
+        expected = FIXTURE_NAME_RE.match(path.name)["variant"] == "fail"
+        if violated != expected:
+            wrong += 1
+            verdict = "violates" if violated else "satisfies"
+            print(f"WRONG {path}: expected {'fail' if expected else 'pass'}, {verdict} the rule")
+    print(f"checked {len(results)} fixtures, {wrong} wrong")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+import heapq
+import io
+import re
+from bisect import bisect_right
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from itertools import chain, islice
+from typing import BinaryIO
+
+
+# PDF 32000-1 9.7.5.1 limits every begin...end block to 100 entries.
+MAX_BLOCK_ENTRIES = 100
+# Single-byte codes up to 0x80 and two-byte codes with lead bytes 0x81-0xFE.
+SHIFT_JIS_CODESPACE = [(b"\x00", b"\x80"), (b"\x81\x40", b"\xfe\xfe")]
+
+SECTION_RE = re.compile(
+    rb"\bbegin(codespacerange|cidrange|cidchar)\b(.*?)\bend\1\b",
+    re.DOTALL,
+)
+TOKEN_RE = re.compile(rb"<([0-9A-Fa-f\s]*)>|(\d+)")
+WMODE_RE = re.compile(rb"/WMode\s+(\d+)\s+def")
+CMAP_NAME_RE = re.compile(rb"/CMapName\s*/([^\s/<>\[\]()]+)\s+def")
+REGISTRY_RE = re.compile(rb"/Registry\s*\(([^)]*)\)")
+ORDERING_RE = re.compile(rb"/Ordering\s*\(([^)]*)\)")
+SUPPLEMENT_RE = re.compile(rb"/Supplement\s+(\d+)")
+
+
+def _hex(code: bytes) -> bytes:
+    return b"<" + code.hex().upper().encode() + b">"
+
+
+def _ps_string(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + escaped.encode("latin-1") + b")"
+
+
+def _write_blocks(
+    handle: BinaryIO,
+    section: bytes,
+    entries: Iterable[tuple],
+    format_entry: Callable[..., bytes],
+) -> None:
+    # Consumes ``entries`` a block at a time, so generated entry streams of
+    # any length are never materialized.
+    entries = iter(entries)
+    while block := list(islice(entries, MAX_BLOCK_ENTRIES)):
+        handle.write(b"%d begin%s\n" % (len(block), section))
+        handle.writelines(format_entry(*entry) for entry in block)
+        handle.write(b"end%s\n" % section)
+
+
+def write_cmap(
+    handle: BinaryIO,
+    name: str,
+    cmap_type: int = 1,
+    wmode: int | None = 0,
+    cid_system_info: tuple[str, str, int] | None = None,
+    codespace_ranges: Iterable[tuple[bytes, bytes]] = (),
+    cid_ranges: Iterable[tuple[bytes, bytes, int]] = (),
+    cid_chars: Iterable[tuple[bytes, int]] = (),
+    bf_chars: Iterable[tuple[bytes, bytes]] = (),
+) -> None:
+    handle.write(
+        b"/CIDInit /ProcSet findresource begin\n"
+        b"12 dict begin\n"
+        b"begincmap\n"
+    )
+    if cid_system_info is not None:
+        registry, ordering, supplement = cid_system_info
+        handle.write(
+            b"/CIDSystemInfo << /Registry %s /Ordering %s /Supplement %d >> def\n"
+            % (_ps_string(registry), _ps_string(ordering), supplement)
+        )
+    handle.write(b"/CMapName /%s def\n" % name.encode())
+    handle.write(b"/CMapType %d def\n" % cmap_type)
+    if wmode is not None:
+        handle.write(b"/WMode %d def\n" % wmode)
+    _write_blocks(
+        handle,
+        b"codespacerange",
+        codespace_ranges,
+        lambda low, high: b"%s %s\n" % (_hex(low), _hex(high)),
+    )
+    _write_blocks(
+        handle,
+        b"cidrange",
+        cid_ranges,
+        lambda low, high, cid: b"%s %s %d\n" % (_hex(low), _hex(high), cid),
+    )
+    _write_blocks(
+        handle,
+        b"cidchar",
+        cid_chars,
+        lambda code, cid: b"%s %d\n" % (_hex(code), cid),
+    )
+    _write_blocks(
+        handle,
+        b"bfchar",
+        bf_chars,
+        lambda code, unicode: b"%s %s\n" % (_hex(code), _hex(unicode)),
+    )
+    handle.write(
+        b"endcmap\n"
+        b"CMapName currentdict /CMap defineresource pop\n"
+        b"end\n"
+        b"end\n"
+    )
+
+
+def cmap_program(name: str, **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    write_cmap(buffer, name, **kwargs)
+    return buffer.getvalue()
+
+
+def two_byte_cid_ranges(
+    range_count: int,
+    first_cid: int,
+    lead_bytes: range = range(0x81, 0xFF),
+    trail_bytes: range = range(0x40, 0xFF),
+) -> Iterable[tuple[bytes, bytes, int]]:
+    # CJK-style cidranges: each lead byte's row of trail bytes is cut into
+    # equal runs, with CIDs assigned consecutively across all of them.
+    rows_needed = -(-range_count // len(lead_bytes))
+    if rows_needed > len(trail_bytes):
+        raise ValueError(f"at most {len(lead_bytes) * len(trail_bytes)} ranges fit")
+    run = len(trail_bytes) // rows_needed
+    cid = first_cid
+    emitted = 0
+    for lead in lead_bytes:
+        for start in range(0, run * rows_needed, run):
+            if emitted == range_count:
+                return
+            low = trail_bytes[start]
+            high = trail_bytes[start + run - 1]
+            yield bytes((lead, low)), bytes((lead, high)), cid
+            cid += run
+            emitted += 1
+
+
+def shift_jis_cid_ranges(range_count: int) -> Iterable[tuple[bytes, bytes, int]]:
+    # The shape of a Shift-JIS CMap: single-byte ASCII mapped onto itself
+    # (so a <41> still selects CID 0x41) plus range_count two-byte ranges.
+    return chain([(b"\x20", b"\x7e", 0x20)], two_byte_cid_ranges(range_count, first_cid=0x100))
+
+
+class IntervalIndex:
+    # Sorted, non-overlapping [low, high] integer intervals, each carrying a
+    # value; find() is a bisect over the lower bounds. Where the input
+    # overlaps, the interval given later wins over the part it covers (as a
+    # CMap's cidchar overrides a code inside an earlier cidrange); find()
+    # still reports the winning interval's own low bound.
+
+    def __init__(self, intervals: Iterable[tuple[int, int, object]]) -> None:
+        given = list(intervals)
+        ordered = sorted(range(len(given)), key=lambda index: given[index][0])
+        if any(
+            given[ordered[position]][0] <= given[ordered[position - 1]][1]
+            for position in range(1, len(ordered))
+        ):
+            pieces = _resolve_overlaps(given, ordered)
+        else:
+            pieces = []
+            for index in ordered:
+                low, high, value = given[index]
+                pieces.append((low, high, low, value))
+        self.lows = [low for low, _, _, _ in pieces]
+        self.highs = [high for _, high, _, _ in pieces]
+        self.origins = [origin for _, _, origin, _ in pieces]
+        self.values = [value for _, _, _, value in pieces]
+
+    def __len__(self) -> int:
+        return len(self.lows)
+
+    def find(self, value: int) -> tuple[int, object] | None:
+        index = bisect_right(self.lows, value) - 1
+        if index < 0 or value > self.highs[index]:
+            return None
+        return self.origins[index], self.values[index]
+
+
+def _resolve_overlaps(
+    given: list[tuple[int, int, object]],
+    ordered: list[int],
+) -> list[tuple[int, int, int, object]]:
+    # Sweeps the elementary segments between interval bounds, keeping a heap
+    # of the intervals covering the current one with the latest given on
+    # top; adjacent segments won by the same interval are merged.
+    bounds = sorted({bound for low, high, _ in given for bound in (low, high + 1)})
+    pieces: list[tuple[int, int, int, object]] = []
+    active: list[int] = []
+    owners: list[int] = []
+    position = 0
+    for start, stop in zip(bounds, bounds[1:]):
+        while position < len(ordered) and given[ordered[position]][0] <= start:
+            heapq.heappush(active, -ordered[position])
+            position += 1
+        while active and given[-active[0]][1] < start:
+            heapq.heappop(active)
+        if not active:
+            continue
+        owner = -active[0]
+        low, _, value = given[owner]
+        if pieces and owners[-1] == owner and pieces[-1][1] == start - 1:
+            pieces[-1] = (pieces[-1][0], stop - 1, low, value)
+        else:
+            pieces.append((start, stop - 1, low, value))
+            owners.append(owner)
+    return pieces
+
+
+@dataclass
+class CMap:
+    name: str | None = None
+    wmode: int = 0
+    cid_system_info: tuple[str, str, int] | None = None
+    # Both indexes are keyed by code length in bytes.
+    codespace: dict[int, IntervalIndex] = field(default_factory=dict)
+    cids: dict[int, IntervalIndex] = field(default_factory=dict)
+
+    def in_codespace(self, code: bytes) -> bool:
+        index = self.codespace.get(len(code))
+        found = index.find(int.from_bytes(code, "big")) if index else None
+        if found is None:
+            return False
+        # Codespace ranges bound every byte separately, not just the
+        # code's numeric value.
+        low, high = found[1]
+        return all(
+            low_byte <= byte <= high_byte
+            for byte, low_byte, high_byte in zip(code, low, high)
+        )
+
+    def lookup(self, code: bytes) -> int | None:
+        index = self.cids.get(len(code))
+        value = int.from_bytes(code, "big")
+        found = index.find(value) if index else None
+        if found is None:
+            return None
+        low, cid = found
+        return cid + value - low
+
+    def decode(self, data: bytes) -> list[int | None]:
+        # Splits a string into codes by the codespace (shortest match first)
+        # and maps each one; unmapped or out-of-codespace codes are None.
+        lengths = sorted(self.codespace) or [1]
+        cids = []
+        offset = 0
+        while offset < len(data):
+            for length in lengths:
+                code = data[offset:offset + length]
+                if len(code) == length and self.in_codespace(code):
+                    break
+            else:
+                length = lengths[0]
+                code = None
+            cids.append(None if code is None else self.lookup(code))
+            offset += length
+        return cids
+
+
+def _entries(body: bytes, width: int) -> Iterable[tuple]:
+    tokens = [
+        bytes.fromhex(match[1].decode()) if match[1] is not None else int(match[2])
+        for match in TOKEN_RE.finditer(body)
+    ]
+    if len(tokens) % width:
+        raise ValueError("truncated CMap entry")
+    return zip(*[iter(tokens)] * width)
+
+
+def parse_cmap(data: bytes) -> CMap:
+    cmap = CMap()
+    if match := CMAP_NAME_RE.search(data):
+        cmap.name = match[1].decode("latin-1")
+    if match := WMODE_RE.search(data):
+        cmap.wmode = int(match[1])
+    registry = REGISTRY_RE.search(data)
+    ordering = ORDERING_RE.search(data)
+    if registry and ordering:
+        supplement = SUPPLEMENT_RE.search(data)
+        cmap.cid_system_info = (
+            registry[1].decode("latin-1"),
+            ordering[1].decode("latin-1"),
+            int(supplement[1]) if supplement else 0,
+        )
+
+    codespace: dict[int, list] = {}
+    cids: dict[int, list] = {}
+    # Single-code mappings go in after every range, so a cidchar overrides
+    # the cidrange covering its code wherever it appears in the program.
+    cid_chars: dict[int, list] = {}
+    for match in SECTION_RE.finditer(data):
+        section, body = match[1], match[2]
+        if section == b"codespacerange":
+            for low, high in _entries(body, 2):
+                codespace.setdefault(len(low), []).append(
+                    (int.from_bytes(low, "big"), int.from_bytes(high, "big"), (low, high))
+                )
+        elif section == b"cidrange":
+            for low, high, cid in _entries(body, 3):
+                cids.setdefault(len(low), []).append(
+                    (int.from_bytes(low, "big"), int.from_bytes(high, "big"), cid)
+                )
+        else:
+            for code, cid in _entries(body, 2):
+                value = int.from_bytes(code, "big")
+                cid_chars.setdefault(len(code), []).append((value, value, cid))
+    for length, chars in cid_chars.items():
+        cids.setdefault(length, []).extend(chars)
+    cmap.codespace = {length: IntervalIndex(ranges) for length, ranges in codespace.items()}
+    cmap.cids = {length: IntervalIndex(ranges) for length, ranges in cids.items()}
+    return cmap
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import sys
+import time
+from itertools import combinations, product
+from pathlib import Path
+
+import pikepdf
+
+import generate_mh_ua1_7_10_1__OCProperties_Config_Name_missing as ocproperties
+import generate_mh_ua1_7_18_8_2__PrinterMark_AP_not_Artifact as printermark
+import generate_mh_ua1_7_1_3_A_circular_mapping_exists as role_map
+import generate_mh_ua1_7_21_3_1__CIDSystemInfo_Registry_mismatch as cid_font
+import generate_mh_ua1_7_9_2__Note_ID_duplicate as notes
+from check_fixtures import violated_rules
+from font_subset import glyph_ids_in_content
+from mutations import MUTATIONS
+from save_profiles import save_pdf
+from skeleton import clone_skeleton
+
+
+OUTPUT_DIR = Path("output/combined")
+EXPECTED_NAME = "expected.json"
+PASS_LEVEL = "pass"
+# One factor per rule: its levels are "pass" and each mutation breaking it.
+FACTORS = {
+    rule: (
+        PASS_LEVEL,
+        *sorted(name for name, mutation in MUTATIONS.items() if mutation.rule == rule),
+    )
+    for rule in sorted({mutation.rule for mutation in MUTATIONS.values()})
+}
+
+
+def covering_array(levels: list[int], strength: int) -> list[tuple[int, ...]]:
+    # Greedy t-wise covering array: every combination of values of every
+    # ``strength`` factors appears in some row. Each row starts from the
+    # smallest uncovered interaction and fixes the remaining factors one at
+    # a time to the value completing the most uncovered interactions.
+    factor_count = len(levels)
+    if not 1 <= strength <= factor_count:
+        raise ValueError(f"strength must be between 1 and {factor_count}")
+    uncovered = {
+        (factors, values)
+        for factors in combinations(range(factor_count), strength)
+        for values in product(*(range(levels[factor]) for factor in factors))
+    }
+    rows = []
+    while uncovered:
+        seed_factors, seed_values = min(uncovered)
+        row: list[int | None] = [None] * factor_count
+        for factor, value in zip(seed_factors, seed_values):
+            row[factor] = value
+        for factor in range(factor_count):
+            if row[factor] is not None:
+                continue
+            assigned = [other for other in range(factor_count) if row[other] is not None]
+
+            def completed(value: int) -> int:
+                count = 0
+                for others in combinations(assigned, strength - 1):
+                    factors = tuple(sorted((*others, factor)))
+                    values = tuple(value if each == factor else row[each] for each in factors)
+                    count += (factors, values) in uncovered
+                return count
+
+            row[factor] = max(range(levels[factor]), key=lambda value: (completed(value), -value))
+        rows.append(tuple(row))
+        uncovered -= {
+            (factors, tuple(row[factor] for factor in factors))
+            for factors in combinations(range(factor_count), strength)
+        }
+    return rows
+
+
+def build_skeleton(pdf: pikepdf.Pdf) -> None:
+    # Every rule's feature in its passing form, from the rule generators'
+    # own builders: tagged Notes, a RoleMap, OC configurations, a Type0
+    # font with an embedded CMap and an artifact-wrapped PrinterMark.
+    pdf.Root.Metadata = notes.build_xmp_metadata(pdf)
+    page = pdf.add_blank_page(page_size=(612, 792))
+    page.Tabs = pikepdf.Name("/S")
+    notes.build_structure(pdf, page, duplicate_ids=False)
+    notes.build_page_content(pdf, page)
+    pdf.Root.StructTreeRoot.RoleMap = role_map.build_struct_tree_root(circular=False).RoleMap
+    pdf.Root.OCProperties = ocproperties.build_ocproperties(pdf, missing_name=False)
+    page.Resources.Font.F2 = cid_font.build_type0_font(
+        pdf,
+        cid_font.build_cmap_stream(pdf),
+        "RegistryB",
+        "RegistryB",
+        glyph_ids_in_content(b""),
+    )
+    appearance = printermark.build_printermark_appearance(pdf, artifact_wrapped=True)
+    annotation = pikepdf.Dictionary(
+        Type=pikepdf.Name("/Annot"),
+        Subtype=pikepdf.Name("/PrinterMark"),
+        Rect=[50, 50, 150, 120],
+        AP=pikepdf.Dictionary(N=appearance),
+    )
+    page.Annots = [pdf.make_indirect(annotation)]
+
+
+def make_pdf(levels: dict[str, str]) -> pikepdf.Pdf:
+    pdf = clone_skeleton(__name__, build_skeleton)
+    for rule, level in levels.items():
+        if level != PASS_LEVEL:
+            MUTATIONS[level].apply(pdf)
+    return pdf
+
+
+def combined_path(output_dir: Path, strength: int, index: int) -> Path:
+    return output_dir / f"mh_ua1-combined_t{strength}_{index:04d}.pdf"
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Build multi-violation documents covering every t-way combination "
+        "of per-rule violations.",
+    )
+    parser.add_argument(
+        "-t",
+        "--strength",
+        type=int,
+        default=2,
+        help="cover every combination of this many rules' levels (default: 2, pairwise)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        default=OUTPUT_DIR,
+        help=f"where the documents and {EXPECTED_NAME} are written (default: {OUTPUT_DIR})",
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        dest="list_only",
+        action="store_true",
+        help="print the chosen combinations without building them",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    rules = list(FACTORS)
+    rows = covering_array([len(FACTORS[rule]) for rule in rules], args.strength)
+    naive = math.prod(len(levels) for levels in FACTORS.values())
+
+    start = time.perf_counter()
+    expected = []
+    wrong = 0
+    for index, row in enumerate(rows):
+        levels = {rule: FACTORS[rule][value] for rule, value in zip(rules, row)}
+        failures = sorted(rule for rule, level in levels.items() if level != PASS_LEVEL)
+        output_path = combined_path(args.output_dir, args.strength, index)
+        if args.list_only:
+            print(f"{output_path.name}  {' '.join(levels.values())}")
+            continue
+        pdf = make_pdf(levels)
+        save_pdf(pdf, output_path, deterministic_id=True)
+        pdf.close()
+        # The oracles confirm the violations did not mask or add to each
+        # other.
+        found = sorted(violated_rules(output_path))
+        if found != failures:
+            wrong += 1
+            print(f"WRONG {output_path}: expected {failures}, oracles found {found}")
+        expected.append(
+            {"path": str(output_path), "levels": levels, "expected_failures": failures}
+        )
+
+    print(
+        f"{len(rows)} documents cover every {args.strength}-way combination of "
+        f"{len(rules)} rules (full product: {naive})"
+    )
+    if args.list_only:
+        return 0
+    (args.output_dir / EXPECTED_NAME).write_text(json.dumps(expected, indent=1) + "\n")
+    print(f"built {len(rows)} documents in {time.perf_counter() - start:.2f} s, {wrong} wrong")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
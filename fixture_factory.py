@@ -0,0 +1,89 @@
+import importlib
+import inspect
+import json
+from collections import OrderedDict
+from dataclasses import replace
+from functools import lru_cache
+
+from run_corpus import Fixture, discover_fixtures, render_fixture
+
+
+# Upper bound on rendered fixtures kept per process; least recently used
+# entries are evicted first.
+MAX_FIXTURES = 256
+
+_fixtures: OrderedDict[tuple, bytes] = OrderedDict()
+
+
+@lru_cache(maxsize=None)
+def _table_fixtures() -> tuple[Fixture, ...]:
+    return tuple(discover_fixtures(stress=True))
+
+
+def _accepts(module: str, params: dict) -> bool:
+    build_pdf = importlib.import_module(module).build_pdf
+    try:
+        inspect.signature(build_pdf).bind_partial(None, **params)
+    except TypeError:
+        return False
+    return True
+
+
+def resolve_fixture(
+    rule: str,
+    variant: str = "fail",
+    generator: str | None = None,
+    profile: str | None = None,
+    **params,
+) -> Fixture:
+    # The first FIXTURES (then STRESS_FIXTURES) entry for the rule and
+    # variant whose generator takes ``params``, with those parameters laid
+    # over the entry's own. ``generator`` picks among several generators
+    # for one rule by a substring of the module name.
+    for fixture in _table_fixtures():
+        if fixture.rule != rule or fixture.variant != variant:
+            continue
+        if generator is not None and generator not in fixture.module:
+            continue
+        if not _accepts(fixture.module, params):
+            continue
+        return replace(fixture, params={**fixture.params, **params}, profile=profile)
+    raise LookupError(
+        f"no {variant} fixture for rule {rule}"
+        + (f" in a generator matching {generator!r}" if generator else "")
+        + (f" taking {sorted(params)}" if params else "")
+    )
+
+
+def make_fixture(
+    rule: str,
+    variant: str = "fail",
+    generator: str | None = None,
+    profile: str | None = None,
+    **params,
+) -> bytes:
+    # Renders the fixture in memory and returns the PDF's bytes; nothing is
+    # written to disk. Results are memoized per parameter set, so callers
+    # share one immutable bytes object (wrap it in a memoryview to slice
+    # without copying).
+    fixture = resolve_fixture(rule, variant, generator, profile, **params)
+    key = (
+        fixture.module,
+        str(fixture.output_path),
+        profile,
+        json.dumps(fixture.params, sort_keys=True, default=str),
+    )
+    if key in _fixtures:
+        _fixtures.move_to_end(key)
+        return _fixtures[key]
+    _, outputs = render_fixture(fixture)
+    # Sidecar outputs (answer files) are dropped; only the PDF is returned.
+    data = next(data for path, data in outputs if path == fixture.output_path)
+    _fixtures[key] = data
+    while len(_fixtures) > MAX_FIXTURES:
+        _fixtures.popitem(last=False)
+    return data
+
+
+def clear_cache() -> None:
+    _fixtures.clear()
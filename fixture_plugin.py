@@ -0,0 +1,25 @@
+# pytest plugin generating fixtures on demand; enable it with
+# ``-p fixture_plugin`` or ``pytest_plugins = ["fixture_plugin"]``.
+#
+#     def test_rejects(validator, matterhorn_fixture):
+#         assert not validator(matterhorn_fixture("7.9-2", note_count=1_000))
+#
+#     @pytest.mark.parametrize(
+#         "matterhorn_pdf", [{"rule": "7.1-3", "variant": "pass"}], indirect=True
+#     )
+#     def test_accepts(validator, matterhorn_pdf):
+#         assert validator(matterhorn_pdf)
+import pytest
+
+from fixture_factory import make_fixture
+
+
+@pytest.fixture(scope="session")
+def matterhorn_fixture():
+    return make_fixture
+
+
+@pytest.fixture
+def matterhorn_pdf(request) -> bytes:
+    # Indirectly parametrized with make_fixture's keyword arguments.
+    return make_fixture(**request.param)
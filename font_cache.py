@@ -0,0 +1,97 @@
+import mmap
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from functools import lru_cache
+from pathlib import Path
+from typing import TypeVar
+
+from font_subset import FontMetrics, read_font_metrics, subset_truetype
+from telemetry import phase
+
+
+FONT_CANDIDATES = (
+    Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
+    Path("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"),
+    Path("/usr/share/fonts/truetype/freefont/FreeSans.ttf"),
+)
+
+# Upper bound on derived artifacts (subset programs, compressed payloads,
+# parsed metrics) kept per process; least recently used entries are evicted first.
+MAX_DERIVED_ARTIFACTS = 64
+
+T = TypeVar("T")
+
+_font_buffers: dict[Path, tuple[tuple, mmap.mmap]] = {}
+_derived_artifacts: OrderedDict[tuple, object] = OrderedDict()
+
+
+@lru_cache(maxsize=None)
+def find_font_path() -> Path:
+    for path in FONT_CANDIDATES:
+        if path.exists():
+            return path
+    raise FileNotFoundError("No suitable TrueType font found on the system.")
+
+
+def _loaded_font(path: Path) -> tuple[tuple, mmap.mmap]:
+    # The font is stat-ed once, when it is first mapped; every later lookup
+    # reuses that (path, mtime, size) key, so a font replaced mid-run is
+    # only picked up after clear_cache().
+    cached = _font_buffers.get(path)
+    if cached is None:
+        stat = path.stat()
+        with path.open("rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        cached = _font_buffers[path] = ((str(path), stat.st_mtime_ns, stat.st_size), buffer)
+    return cached
+
+
+def load_font(path: Path) -> mmap.mmap:
+    # Read-only mappings are backed by the page cache, so every worker that
+    # maps the same font shares its pages instead of holding a private copy.
+    return _loaded_font(path)[1]
+
+
+def derived_artifact(path: Path, name: Hashable, factory: Callable[[], T]) -> T:
+    key = (*_loaded_font(path)[0], name)
+    if key in _derived_artifacts:
+        _derived_artifacts.move_to_end(key)
+        return _derived_artifacts[key]
+    value = factory()
+    _derived_artifacts[key] = value
+    while len(_derived_artifacts) > MAX_DERIVED_ARTIFACTS:
+        _derived_artifacts.popitem(last=False)
+    return value
+
+
+def font_metrics(path: Path) -> FontMetrics:
+    return derived_artifact(path, "metrics", lambda: read_font_metrics(load_font(path)))
+
+
+def font_file_payload(path: Path, glyph_ids: Iterable[int] | None = None) -> tuple[bytes, int]:
+    # Returns the Flate-compressed FontFile2 data and its decoded length
+    # (the stream's /Length1). None embeds the whole font program.
+    glyphs = None if glyph_ids is None else tuple(sorted(set(glyph_ids)))
+
+    def build() -> tuple[bytes, int]:
+        font_data = load_font(path)
+        if glyphs is None:
+            # zlib reads the mapping through the buffer protocol; slicing it
+            # first would copy the whole program into the process.
+            return zlib.compress(font_data, 9), len(font_data)
+        program = subset_truetype(font_data, glyphs)
+        return zlib.compress(program, 9), len(program)
+
+    with phase("font_load", font=str(path), glyphs=None if glyphs is None else len(glyphs)) as event:
+        payload = derived_artifact(path, ("FontFile2", glyphs), build)
+        event["bytes"] = len(payload[0])
+    return payload
+
+
+def clear_cache() -> None:
+    find_font_path.cache_clear()
+    _derived_artifacts.clear()
+    for _key, buffer in _font_buffers.values():
+        buffer.close()
+    _font_buffers.clear()
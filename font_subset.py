@@ -0,0 +1,210 @@
+import struct
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import pikepdf
+
+
+# Tables a CIDFontType2 FontFile2 program needs (ISO 32000-1, 9.9), plus
+# OS/2 so embedding-permission checks still have something to read.
+KEPT_TABLES = (b"OS/2", b"cvt ", b"fpgm", b"glyf", b"head", b"hhea", b"hmtx", b"loca", b"maxp", b"prep")
+
+TEXT_SHOWING_OPERATORS = {"Tj", "TJ", "'", '"'}
+
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+
+def read_table_directory(font_data: bytes) -> dict[bytes, tuple[int, int]]:
+    num_tables = struct.unpack_from(">H", font_data, 4)[0]
+    tables = {}
+    for index in range(num_tables):
+        tag, _checksum, offset, length = struct.unpack_from(
+            ">4sIII", font_data, 12 + 16 * index
+        )
+        tables[tag] = (offset, length)
+    return tables
+
+
+def read_glyph_offsets(font_data: bytes, tables: dict[bytes, tuple[int, int]]) -> list[int]:
+    head_offset, _ = tables[b"head"]
+    maxp_offset, _ = tables[b"maxp"]
+    loca_offset, _ = tables[b"loca"]
+    long_offsets = struct.unpack_from(">h", font_data, head_offset + 50)[0] == 1
+    num_glyphs = struct.unpack_from(">H", font_data, maxp_offset + 4)[0]
+    if long_offsets:
+        return list(struct.unpack_from(f">{num_glyphs + 1}I", font_data, loca_offset))
+    return [
+        offset * 2
+        for offset in struct.unpack_from(f">{num_glyphs + 1}H", font_data, loca_offset)
+    ]
+
+
+@dataclass(frozen=True)
+class FontMetrics:
+    # In PDF glyph space, 1000 units per em; widths holds every glyph's
+    # advance width, indexed by glyph ID.
+    bbox: tuple[int, int, int, int]
+    ascent: int
+    descent: int
+    widths: tuple[int, ...]
+
+
+def read_font_metrics(font_data: bytes) -> FontMetrics:
+    tables = read_table_directory(font_data)
+    head_offset, _ = tables[b"head"]
+    hhea_offset, _ = tables[b"hhea"]
+    maxp_offset, _ = tables[b"maxp"]
+    hmtx_offset, _ = tables[b"hmtx"]
+    units_per_em = struct.unpack_from(">H", font_data, head_offset + 18)[0]
+    scale = 1000 / units_per_em
+    bbox = struct.unpack_from(">4h", font_data, head_offset + 36)
+    ascent, descent = struct.unpack_from(">hh", font_data, hhea_offset + 4)
+    num_h_metrics = struct.unpack_from(">H", font_data, hhea_offset + 34)[0]
+    num_glyphs = struct.unpack_from(">H", font_data, maxp_offset + 4)[0]
+    # hmtx holds (advance, left side bearing) pairs; glyphs past the last
+    # pair repeat its advance.
+    advances = struct.unpack_from(f">{2 * num_h_metrics}H", font_data, hmtx_offset)[0::2]
+    advances += (advances[-1],) * (num_glyphs - num_h_metrics)
+    return FontMetrics(
+        bbox=tuple(round(value * scale) for value in bbox),
+        ascent=round(ascent * scale),
+        descent=round(descent * scale),
+        widths=tuple(round(advance * scale) for advance in advances),
+    )
+
+
+def glyph_ids_in_content(content: bytes) -> set[int]:
+    # Codes drawn by a single-byte Identity encoding are the glyph IDs. The
+    # content is parsed in a scratch document so the caller's object
+    # numbering is left untouched.
+    scratch = pikepdf.Pdf.new()
+    glyph_ids = set()
+    for operands, operator in pikepdf.parse_content_stream(pikepdf.Stream(scratch, content)):
+        if str(operator) not in TEXT_SHOWING_OPERATORS:
+            continue
+        for operand in operands:
+            items = operand if isinstance(operand, pikepdf.Array) else [operand]
+            for item in items:
+                if isinstance(item, pikepdf.String):
+                    glyph_ids.update(bytes(item))
+    return glyph_ids
+
+
+def _component_glyph_ids(glyph: bytes) -> list[int]:
+    if len(glyph) < 10 or struct.unpack_from(">h", glyph, 0)[0] >= 0:
+        return []
+    components = []
+    position = 10
+    while True:
+        flags, glyph_index = struct.unpack_from(">HH", glyph, position)
+        components.append(glyph_index)
+        position += 4
+        position += 4 if flags & ARG_1_AND_2_ARE_WORDS else 2
+        if flags & WE_HAVE_A_SCALE:
+            position += 2
+        elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+            position += 4
+        elif flags & WE_HAVE_A_TWO_BY_TWO:
+            position += 8
+        if not flags & MORE_COMPONENTS:
+            return components
+
+
+def _table_checksum(data: bytes) -> int:
+    # Reads data in place; only a trailing partial word is padded.
+    whole = len(data) // 4
+    total = sum(struct.unpack_from(f">{whole}I", data))
+    tail = bytes(data[4 * whole:])
+    if tail:
+        total += struct.unpack(">I", tail.ljust(4, b"\0"))[0]
+    return total & 0xFFFFFFFF
+
+
+def subset_truetype(font_data: bytes, glyph_ids: Iterable[int]) -> bytes:
+    # Unused glyphs become empty glyf/loca entries rather than being removed,
+    # so glyph IDs stay stable and an Identity CIDToGIDMap still resolves.
+    tables = read_table_directory(font_data)
+    offsets = read_glyph_offsets(font_data, tables)
+    num_glyphs = len(offsets) - 1
+    glyf_offset, _ = tables[b"glyf"]
+
+    def glyph_bytes(glyph_id: int) -> bytes:
+        start, end = offsets[glyph_id], offsets[glyph_id + 1]
+        return bytes(font_data[glyf_offset + start:glyf_offset + end])
+
+    kept = set()
+    pending = [0, *(glyph_id for glyph_id in glyph_ids if 0 <= glyph_id < num_glyphs)]
+    while pending:
+        glyph_id = pending.pop()
+        if glyph_id in kept:
+            continue
+        kept.add(glyph_id)
+        pending.extend(_component_glyph_ids(glyph_bytes(glyph_id)))
+
+    glyf = bytearray()
+    loca = bytearray()
+    for glyph_id in range(num_glyphs):
+        loca += struct.pack(">I", len(glyf))
+        if glyph_id in kept:
+            glyf += glyph_bytes(glyph_id)
+            glyf += b"\0" * (-len(glyf) % 4)
+    loca += struct.pack(">I", len(glyf))
+
+    hhea_offset, _ = tables[b"hhea"]
+    num_h_metrics = struct.unpack_from(">H", font_data, hhea_offset + 34)[0]
+    hmtx_offset, hmtx_length = tables[b"hmtx"]
+    hmtx = bytearray(font_data[hmtx_offset:hmtx_offset + hmtx_length])
+    for glyph_id in range(num_glyphs):
+        if glyph_id in kept:
+            continue
+        if glyph_id < num_h_metrics:
+            hmtx[4 * glyph_id:4 * glyph_id + 4] = b"\0\0\0\0"
+        else:
+            position = 4 * num_h_metrics + 2 * (glyph_id - num_h_metrics)
+            hmtx[position:position + 2] = b"\0\0"
+
+    head_offset, head_length = tables[b"head"]
+    head = bytearray(font_data[head_offset:head_offset + head_length])
+    head[8:12] = b"\0\0\0\0"
+    head[50:52] = struct.pack(">h", 1)
+
+    new_tables = {}
+    for tag in KEPT_TABLES:
+        if tag not in tables:
+            continue
+        offset, length = tables[tag]
+        new_tables[tag] = bytes(font_data[offset:offset + length])
+    new_tables.update({b"glyf": bytes(glyf), b"loca": bytes(loca), b"hmtx": bytes(hmtx), b"head": bytes(head)})
+
+    num_tables = len(new_tables)
+    entry_selector = num_tables.bit_length() - 1
+    search_range = 16 << entry_selector
+    header = struct.pack(
+        ">IHHHH",
+        0x00010000,
+        num_tables,
+        search_range,
+        entry_selector,
+        num_tables * 16 - search_range,
+    )
+
+    directory = bytearray()
+    body = bytearray()
+    body_offset = 12 + 16 * num_tables
+    for tag in sorted(new_tables):
+        data = new_tables[tag]
+        if tag == b"head":
+            head_position = body_offset + len(body)
+        directory += struct.pack(">4sIII", tag, _table_checksum(data), body_offset + len(body), len(data))
+        body += data + b"\0" * (-len(data) % 4)
+
+    font = bytearray(header)
+    font += directory
+    font += body
+    adjustment = (0xB1B0AFBA - _table_checksum(font)) & 0xFFFFFFFF
+    font[head_position + 8:head_position + 12] = struct.pack(">I", adjustment)
+    return bytes(font)
@@ -3,6 +3,11 @@ from pathlib import Path
 
 import pikepdf
 
+from optional_content import build_scaled_pdf
+from save_profiles import save_pdf
+from skeleton import clone_skeleton
+from telemetry import instrumented
+
 
 OUTPUT_DIR = Path("output/ocproperties_ua1_7_10_1")
 FAIL_PATH = OUTPUT_DIR / (
@@ -12,6 +17,12 @@ PASS_PATH = OUTPUT_DIR / (
     "mh_ua1-7.10-1_pass__OCProperties_Config_Name_missing.pdf"
 )
 
+STRESS_DIR = Path("output/stress/ocproperties_ua1_7_10_1")
+
+CONFIG_COUNT = 500
+STRESS_OCG_COUNTS = (1_000, 10_000)
+STRESS_UNNAMED_POSITIONS = ("first", "middle", "last")
+
 
 def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     xmp = (
@@ -34,6 +45,7 @@ def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
+@instrumented("structure")
 def build_ocproperties(pdf: pikepdf.Pdf, missing_name: bool) -> pikepdf.Dictionary:
     ocg = pikepdf.Dictionary(
         Type=pikepdf.Name("/OCG"),
@@ -66,22 +78,72 @@ def build_ocproperties(pdf: pikepdf.Pdf, missing_name: bool) -> pikepdf.Dictiona
     )
 
 
-def build_pdf(output_path: Path, missing_name: bool) -> None:
-    pdf = pikepdf.Pdf.new()
+def build_skeleton(pdf: pikepdf.Pdf) -> None:
     pdf.Root.Metadata = build_xmp_metadata(pdf)
 
     page = pdf.add_blank_page(page_size=(612, 792))
     page.Contents = pikepdf.Stream(pdf, b"")
 
-    pdf.Root.OCProperties = build_ocproperties(pdf, missing_name)
+    pdf.Root.OCProperties = build_ocproperties(pdf, missing_name=False)
+
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    pdf.save(output_path, deterministic_id=True)
+def apply_variant(pdf: pikepdf.Pdf, missing_name: bool) -> None:
+    if missing_name:
+        del pdf.Root.OCProperties.Configs[1].Name
+
+
+def make_pdf(
+    missing_name: bool,
+    ocg_count: int | None = None,
+    config_count: int = CONFIG_COUNT,
+    unnamed_at: tuple[str, ...] = ("last",),
+) -> pikepdf.Pdf:
+    # ocg_count=None keeps the original one-OCG, two-config document.
+    if ocg_count is not None:
+        pdf = build_scaled_pdf(ocg_count, config_count, unnamed_at if missing_name else ())
+        pdf.Root.Metadata = build_xmp_metadata(pdf)
+        return pdf
+    pdf = clone_skeleton(__name__, build_skeleton)
+    apply_variant(pdf, missing_name)
+    return pdf
+
+
+def build_pdf(
+    output_path: Path,
+    missing_name: bool,
+    ocg_count: int | None = None,
+    config_count: int = CONFIG_COUNT,
+    unnamed_at: tuple[str, ...] = ("last",),
+) -> None:
+    pdf = make_pdf(missing_name, ocg_count, config_count, unnamed_at)
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {"missing_name": True}),
+    (PASS_PATH, {"missing_name": False}),
+]
+
+STRESS_FIXTURES = [
+    (
+        STRESS_DIR / f"mh_ua1-7.10-1_pass__OCProperties_Config_Name_missing_{count}x{CONFIG_COUNT}.pdf",
+        {"missing_name": False, "ocg_count": count},
+    )
+    for count in STRESS_OCG_COUNTS
+] + [
+    (
+        STRESS_DIR / f"mh_ua1-7.10-1_fail__OCProperties_Config_Name_missing_{count}x{CONFIG_COUNT}_{position}.pdf",
+        {"missing_name": True, "ocg_count": count, "unnamed_at": [position]},
+    )
+    for count in STRESS_OCG_COUNTS
+    for position in STRESS_UNNAMED_POSITIONS
+]
 
 
 def main() -> None:
-    build_pdf(FAIL_PATH, missing_name=True)
-    build_pdf(PASS_PATH, missing_name=False)
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
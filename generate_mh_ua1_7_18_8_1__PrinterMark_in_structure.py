@@ -3,10 +3,21 @@ from pathlib import Path
 
 import pikepdf
 
+from parent_tree import ParentTreeBuilder
+from printer_marks import add_printermark_pages
+from save_profiles import save_pdf
+from skeleton import clone_skeleton
+from telemetry import instrumented
+
 
 OUTPUT_DIR = Path("output/printermark_ua1_7_18_8_1")
 FAIL_PATH = OUTPUT_DIR / "mh_ua1-7.18.8-1_fail__PrinterMark_in_structure.pdf"
 PASS_PATH = OUTPUT_DIR / "mh_ua1-7.18.8-1_pass__PrinterMark_in_structure.pdf"
+STRESS_DIR = Path("output/stress/printermark_ua1_7_18_8_1")
+
+MARKS_PER_PAGE = 20
+STRESS_PAGE_COUNT = 1000
+STRESS_APPEARANCE_POOLS = [1, 8]
 
 
 def build_xmp_metadata() -> bytes:
@@ -21,8 +32,10 @@ def build_xmp_metadata() -> bytes:
 <?xpacket end='w'?>"""
 
 
+@instrumented("content")
 def build_printermark_appearance(pdf: pikepdf.Pdf) -> pikepdf.Stream:
-    content = b"0 0 1 rg\n10 10 60 40 re\nf\n"
+    # Artifact-wrapped, so the pair differs only in the 7.18.8-1 condition.
+    content = b"/Artifact BMC\n0 0 1 rg\n10 10 60 40 re\nf\nEMC\n"
     return pikepdf.Stream(
         pdf,
         content,
@@ -33,47 +46,50 @@ def build_printermark_appearance(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
-def add_structure(
-    pdf: pikepdf.Pdf,
-    page: pikepdf.Page,
-    annotation: pikepdf.Object,
-    include_printermark: bool,
-) -> None:
+@instrumented("structure")
+def add_structure(pdf: pikepdf.Pdf, page: pikepdf.Page) -> None:
     struct_tree_root = pdf.make_indirect(
         pikepdf.Dictionary(Type=pikepdf.Name("/StructTreeRoot"))
     )
 
-    struct_elem = pikepdf.Dictionary(
-        Type=pikepdf.Name("/StructElem"),
-        S=pikepdf.Name("/P"),
-        P=struct_tree_root,
-        PG=page.obj,
-    )
-
-    if include_printermark:
-        objr = pikepdf.Dictionary(
-            Type=pikepdf.Name("/OBJR"),
-            Obj=annotation,
-            Pg=page.obj,
+    struct_elem = pdf.make_indirect(
+        pikepdf.Dictionary(
+            Type=pikepdf.Name("/StructElem"),
+            S=pikepdf.Name("/P"),
+            P=struct_tree_root,
+            PG=page.obj,
+            K=[],
         )
-        struct_elem.K = [pdf.make_indirect(objr)]
-        annotation.StructParent = 0
-        parent_tree = pikepdf.Dictionary(Nums=[0, pdf.make_indirect(struct_elem)])
-    else:
-        struct_elem.K = []
-        parent_tree = pikepdf.Dictionary(Nums=[])
+    )
 
-    struct_tree_root.K = [pdf.make_indirect(struct_elem)]
-    struct_tree_root.ParentTree = pdf.make_indirect(parent_tree)
+    struct_tree_root.K = [struct_elem]
+    struct_tree_root.ParentTree = pdf.make_indirect(pikepdf.Dictionary(Nums=[]))
 
     pdf.Root.StructTreeRoot = struct_tree_root
     pdf.Root.MarkInfo = pikepdf.Dictionary(Marked=True)
     pdf.Root.Lang = pikepdf.String("en-US")
 
 
-def build_pdf(output_path: Path, include_printermark: bool) -> None:
-    pdf = pikepdf.Pdf.new()
+@instrumented("structure")
+def add_printermark_to_structure(
+    pdf: pikepdf.Pdf,
+    page: pikepdf.Page,
+    annotation: pikepdf.Object,
+) -> None:
+    struct_tree_root = pdf.Root.StructTreeRoot
+    struct_elem = struct_tree_root.K[0]
+
+    objr = pikepdf.Dictionary(
+        Type=pikepdf.Name("/OBJR"),
+        Obj=annotation,
+        Pg=page.obj,
+    )
+    struct_elem.K = [pdf.make_indirect(objr)]
+    annotation.StructParent = 0
+    struct_tree_root.ParentTree.Nums = [0, struct_elem]
+
 
+def build_skeleton(pdf: pikepdf.Pdf) -> None:
     metadata_stream = pikepdf.Stream(
         pdf,
         build_xmp_metadata(),
@@ -94,18 +110,145 @@ def build_pdf(output_path: Path, include_printermark: bool) -> None:
         Rect=[50, 50, 150, 120],
         AP=pikepdf.Dictionary(N=appearance),
     )
-    annot_ref = pdf.make_indirect(annotation)
-    page.Annots = [annot_ref]
+    page.Annots = [pdf.make_indirect(annotation)]
+
+    add_structure(pdf, page)
+
+
+def apply_variant(pdf: pikepdf.Pdf, include_printermark: bool) -> None:
+    if include_printermark:
+        page = pdf.pages[0]
+        add_printermark_to_structure(pdf, page, page.Annots[0])
 
-    add_structure(pdf, page, annot_ref, include_printermark)
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    pdf.save(output_path, deterministic_id=True)
+@instrumented("structure")
+def add_scaled_structure(
+    pdf: pikepdf.Pdf,
+    pages: list[tuple[pikepdf.Page, list[pikepdf.Dictionary]]],
+    include_printermark: bool,
+) -> None:
+    # A Document with one P per page, and /Tabs /S on every page; with
+    # include_printermark every annotation is an OBJR kid of its page's P
+    # and gets a StructParent.
+    struct_tree_root = pdf.make_indirect(
+        pikepdf.Dictionary(Type=pikepdf.Name("/StructTreeRoot"))
+    )
+    document = pdf.make_indirect(
+        pikepdf.Dictionary(
+            Type=pikepdf.Name("/StructElem"),
+            S=pikepdf.Name("/Document"),
+            P=struct_tree_root,
+        )
+    )
+    parent_tree = ParentTreeBuilder()
+    elements = []
+    tabs = pikepdf.Name("/S")
+    for page, annotations in pages:
+        page.Tabs = tabs
+        struct_elem = pdf.make_indirect(
+            pikepdf.Dictionary(
+                Type=pikepdf.Name("/StructElem"),
+                S=pikepdf.Name("/P"),
+                P=document,
+                PG=page.obj,
+            )
+        )
+        kids = []
+        if include_printermark:
+            for annotation in annotations:
+                parent_tree.add_object(annotation, struct_elem)
+                objr = pikepdf.Dictionary(
+                    Type=pikepdf.Name("/OBJR"),
+                    Obj=annotation,
+                    Pg=page.obj,
+                )
+                kids.append(pdf.make_indirect(objr))
+        struct_elem.K = kids
+        elements.append(struct_elem)
+
+    document.K = elements
+    struct_tree_root.K = [document]
+    struct_tree_root.ParentTree = parent_tree.build(pdf)
+    struct_tree_root.ParentTreeNextKey = parent_tree.next_key
+
+    pdf.Root.StructTreeRoot = struct_tree_root
+    pdf.Root.MarkInfo = pikepdf.Dictionary(Marked=True)
+    pdf.Root.Lang = pikepdf.String("en-US")
+
+
+def build_scaled_pdf(
+    include_printermark: bool,
+    page_count: int,
+    marks_per_page: int,
+    appearance_pool: int,
+) -> pikepdf.Pdf:
+    # The appearances are artifact-wrapped so the only violation is 7.18.8-1,
+    # and shared from a pool, so the file grows with the annotations only.
+    pdf = pikepdf.Pdf.new()
+    pdf.Root.Metadata = pikepdf.Stream(
+        pdf,
+        build_xmp_metadata(),
+        Type=pikepdf.Name("/Metadata"),
+        Subtype=pikepdf.Name("/XML"),
+    )
+    pages = add_printermark_pages(
+        pdf, page_count, marks_per_page, appearance_pool, artifact_wrapped=True
+    )
+    add_scaled_structure(pdf, pages, include_printermark)
+    return pdf
+
+
+def make_pdf(
+    include_printermark: bool,
+    page_count: int | None = None,
+    marks_per_page: int = MARKS_PER_PAGE,
+    appearance_pool: int = 1,
+) -> pikepdf.Pdf:
+    # page_count=None keeps the original one-annotation document.
+    if page_count is not None:
+        return build_scaled_pdf(include_printermark, page_count, marks_per_page, appearance_pool)
+    pdf = clone_skeleton(__name__, build_skeleton)
+    apply_variant(pdf, include_printermark)
+    return pdf
+
+
+def build_pdf(
+    output_path: Path,
+    include_printermark: bool,
+    page_count: int | None = None,
+    marks_per_page: int = MARKS_PER_PAGE,
+    appearance_pool: int = 1,
+) -> None:
+    pdf = make_pdf(include_printermark, page_count, marks_per_page, appearance_pool)
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {"include_printermark": True}),
+    (PASS_PATH, {"include_printermark": False}),
+]
+
+STRESS_FIXTURES = [
+    (
+        STRESS_DIR
+        / f"mh_ua1-7.18.8-1_fail__PrinterMark_in_structure_{STRESS_PAGE_COUNT}x{MARKS_PER_PAGE}_pool{pool}.pdf",
+        {"include_printermark": True, "page_count": STRESS_PAGE_COUNT, "appearance_pool": pool},
+    )
+    for pool in STRESS_APPEARANCE_POOLS
+] + [
+    (
+        STRESS_DIR
+        / f"mh_ua1-7.18.8-1_pass__PrinterMark_in_structure_{STRESS_PAGE_COUNT}x{MARKS_PER_PAGE}_pool{pool}.pdf",
+        {"include_printermark": False, "page_count": STRESS_PAGE_COUNT, "appearance_pool": pool},
+    )
+    for pool in STRESS_APPEARANCE_POOLS
+]
 
 
 def main() -> None:
-    build_pdf(FAIL_PATH, include_printermark=True)
-    build_pdf(PASS_PATH, include_printermark=False)
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
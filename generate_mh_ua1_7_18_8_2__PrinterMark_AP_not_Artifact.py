@@ -3,10 +3,20 @@ from pathlib import Path
 
 import pikepdf
 
+from printer_marks import add_printermark_pages
+from save_profiles import save_pdf
+from skeleton import clone_skeleton
+from telemetry import instrumented
+
 
 OUTPUT_DIR = Path("output/printermark_ua1_7_18_8_2")
 FAIL_PATH = OUTPUT_DIR / "mh_ua1-7.18.8-2_fail__PrinterMark_AP_not_Artifact.pdf"
 PASS_PATH = OUTPUT_DIR / "mh_ua1-7.18.8-2_pass__PrinterMark_AP_not_Artifact.pdf"
+STRESS_DIR = Path("output/stress/printermark_ua1_7_18_8_2")
+
+MARKS_PER_PAGE = 20
+STRESS_PAGE_COUNT = 1000
+STRESS_APPEARANCE_POOLS = [1, 8]
 
 
 def build_xmp_metadata() -> bytes:
@@ -21,14 +31,17 @@ def build_xmp_metadata() -> bytes:
 <?xpacket end='w'?>"""
 
 
-def build_printermark_appearance(pdf: pikepdf.Pdf, artifact_wrapped: bool) -> pikepdf.Stream:
+@instrumented("content")
+def build_appearance_content(artifact_wrapped: bool) -> bytes:
     if artifact_wrapped:
-        content = b"/Artifact BMC\n0 0 1 rg\n10 10 60 40 re\nf\nEMC\n"
-    else:
-        content = b"0 0 1 rg\n10 10 60 40 re\nf\n"
+        return b"/Artifact BMC\n0 0 1 rg\n10 10 60 40 re\nf\nEMC\n"
+    return b"0 0 1 rg\n10 10 60 40 re\nf\n"
+
+
+def build_printermark_appearance(pdf: pikepdf.Pdf, artifact_wrapped: bool) -> pikepdf.Stream:
     return pikepdf.Stream(
         pdf,
-        content,
+        build_appearance_content(artifact_wrapped),
         Type=pikepdf.Name("/XObject"),
         Subtype=pikepdf.Name("/Form"),
         BBox=[0, 0, 100, 100],
@@ -36,9 +49,7 @@ def build_printermark_appearance(pdf: pikepdf.Pdf, artifact_wrapped: bool) -> pi
     )
 
 
-def build_pdf(output_path: Path, artifact_wrapped: bool) -> None:
-    pdf = pikepdf.Pdf.new()
-
+def build_skeleton(pdf: pikepdf.Pdf) -> None:
     metadata_stream = pikepdf.Stream(
         pdf,
         build_xmp_metadata(),
@@ -52,7 +63,7 @@ def build_pdf(output_path: Path, artifact_wrapped: bool) -> None:
         del page["/Contents"]
     page.Tabs = pikepdf.Name("/S")
 
-    appearance = build_printermark_appearance(pdf, artifact_wrapped)
+    appearance = build_printermark_appearance(pdf, artifact_wrapped=True)
     annotation = pikepdf.Dictionary(
         Type=pikepdf.Name("/Annot"),
         Subtype=pikepdf.Name("/PrinterMark"),
@@ -61,13 +72,84 @@ def build_pdf(output_path: Path, artifact_wrapped: bool) -> None:
     )
     page.Annots = [pdf.make_indirect(annotation)]
 
-    pdf.save(output_path)
+
+def apply_variant(pdf: pikepdf.Pdf, artifact_wrapped: bool) -> None:
+    if not artifact_wrapped:
+        appearance = pdf.pages[0].Annots[0].AP.N
+        appearance.write(build_appearance_content(artifact_wrapped))
+
+
+@instrumented("content")
+def build_scaled_pdf(
+    artifact_wrapped: bool,
+    page_count: int,
+    marks_per_page: int,
+    appearance_pool: int,
+) -> pikepdf.Pdf:
+    # Every annotation's appearance is one of appearance_pool shared
+    # streams, so the file grows with the annotation dictionaries only.
+    pdf = pikepdf.Pdf.new()
+    pdf.Root.Metadata = pikepdf.Stream(
+        pdf,
+        build_xmp_metadata(),
+        Type=pikepdf.Name("/Metadata"),
+        Subtype=pikepdf.Name("/XML"),
+    )
+    add_printermark_pages(pdf, page_count, marks_per_page, appearance_pool, artifact_wrapped)
+    return pdf
+
+
+def make_pdf(
+    artifact_wrapped: bool,
+    page_count: int | None = None,
+    marks_per_page: int = MARKS_PER_PAGE,
+    appearance_pool: int = 1,
+) -> pikepdf.Pdf:
+    # page_count=None keeps the original one-annotation document.
+    if page_count is not None:
+        return build_scaled_pdf(artifact_wrapped, page_count, marks_per_page, appearance_pool)
+    pdf = clone_skeleton(__name__, build_skeleton)
+    apply_variant(pdf, artifact_wrapped)
+    return pdf
+
+
+def build_pdf(
+    output_path: Path,
+    artifact_wrapped: bool,
+    page_count: int | None = None,
+    marks_per_page: int = MARKS_PER_PAGE,
+    appearance_pool: int = 1,
+) -> None:
+    pdf = make_pdf(artifact_wrapped, page_count, marks_per_page, appearance_pool)
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {"artifact_wrapped": False}),
+    (PASS_PATH, {"artifact_wrapped": True}),
+]
+
+STRESS_FIXTURES = [
+    (
+        STRESS_DIR
+        / f"mh_ua1-7.18.8-2_pass__PrinterMark_AP_not_Artifact_{STRESS_PAGE_COUNT}x{MARKS_PER_PAGE}_pool{pool}.pdf",
+        {"artifact_wrapped": True, "page_count": STRESS_PAGE_COUNT, "appearance_pool": pool},
+    )
+    for pool in STRESS_APPEARANCE_POOLS
+] + [
+    (
+        STRESS_DIR
+        / f"mh_ua1-7.18.8-2_fail__PrinterMark_AP_not_Artifact_{STRESS_PAGE_COUNT}x{MARKS_PER_PAGE}_pool{pool}.pdf",
+        {"artifact_wrapped": False, "page_count": STRESS_PAGE_COUNT, "appearance_pool": pool},
+    )
+    for pool in STRESS_APPEARANCE_POOLS
+]
 
 
 def main() -> None:
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    build_pdf(FAIL_PATH, artifact_wrapped=False)
-    build_pdf(PASS_PATH, artifact_wrapped=True)
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
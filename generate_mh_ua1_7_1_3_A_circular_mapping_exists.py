@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
+import json
 from pathlib import Path
 
 import pikepdf
 
+from output_store import write_output
+from save_profiles import save_pdf
+from skeleton import clone_skeleton
+from telemetry import instrumented
+
 
 OUTPUT_DIR = Path("output/structure_ua1_7_1_3")
 FAIL_PATH = OUTPUT_DIR / (
@@ -11,6 +17,18 @@ FAIL_PATH = OUTPUT_DIR / (
 PASS_PATH = OUTPUT_DIR / (
     "mh_ua1-7.1-3_pass__A_circular_mapping_exists.pdf"
 )
+STRESS_DIR = Path("output/stress/structure_ua1_7_1_3")
+
+# Every acyclic chain ends in this standard structure type.
+STANDARD_TYPE = "/P"
+# "chain": one long chain, optionally running into a cycle at cycle_depth;
+# "disjoint": role_count // cycle_length separate chains or cycles;
+# "fan_in": a tree in which fan_in keys map to each parent, its root ending
+# in STANDARD_TYPE or in a cycle.
+ROLE_MAP_SHAPES = ("chain", "disjoint", "fan_in")
+CYCLE_LENGTH = 2
+FAN_IN = 16
+STRESS_ROLE_COUNTS = (1_000, 100_000, 500_000)
 
 
 def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
@@ -34,6 +52,7 @@ def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
+@instrumented("structure")
 def build_struct_tree_root(circular: bool) -> pikepdf.Dictionary:
     if circular:
         role_map = pikepdf.Dictionary(
@@ -55,22 +74,211 @@ def build_struct_tree_root(circular: bool) -> pikepdf.Dictionary:
     )
 
 
-def build_pdf(output_path: Path, circular: bool) -> None:
+def role_key(index: int) -> str:
+    return f"/Role{index}"
+
+
+def build_role_map(
+    role_count: int,
+    shape: str,
+    circular: bool,
+    cycle_length: int = CYCLE_LENGTH,
+    cycle_depth: int = 0,
+    fan_in: int = FAN_IN,
+) -> tuple[dict[str, str], list[str], list[str]]:
+    # Returns the map together with its answer, both derived from the
+    # construction rather than by searching the map: the keys that lie on a
+    # cycle and the keys that never reach a standard type. Linear in
+    # role_count for every shape.
+    if shape not in ROLE_MAP_SHAPES:
+        raise ValueError(f"unknown RoleMap shape {shape!r}")
+    if cycle_length < 1:
+        raise ValueError("cycle_length must be at least 1")
+    role_map = {}
+    cyclic = []
+    unresolved = []
+
+    def chain(first: int, stop: int, target: str) -> None:
+        for index in range(first, stop):
+            role_map[role_key(index)] = role_key(index + 1)
+        if stop > first:
+            role_map[role_key(stop - 1)] = target
+
+    def cycle(first: int, stop: int) -> None:
+        chain(first, stop, role_key(first))
+        cyclic.extend(role_key(index) for index in range(first, stop))
+
+    if shape == "chain":
+        if not circular:
+            chain(0, role_count, STANDARD_TYPE)
+        else:
+            cycle_stop = cycle_depth + cycle_length
+            if cycle_depth < 0 or cycle_stop > role_count:
+                raise ValueError("the cycle does not fit in role_count keys")
+            chain(0, cycle_depth, role_key(cycle_depth))
+            cycle(cycle_depth, cycle_stop)
+            chain(cycle_stop, role_count, STANDARD_TYPE)
+            unresolved.extend(role_key(index) for index in range(cycle_stop))
+    elif shape == "disjoint":
+        grouped = role_count - role_count % cycle_length
+        for first in range(0, grouped, cycle_length):
+            if circular:
+                cycle(first, first + cycle_length)
+            else:
+                chain(first, first + cycle_length, STANDARD_TYPE)
+        chain(grouped, role_count, STANDARD_TYPE)
+        unresolved.extend(cyclic)
+    else:
+        tree_count = role_count - cycle_length if circular else role_count
+        if tree_count < 1:
+            raise ValueError("the cycle does not fit in role_count keys")
+        for index in range(1, tree_count):
+            role_map[role_key(index)] = role_key((index - 1) // fan_in)
+        if circular:
+            role_map[role_key(0)] = role_key(tree_count)
+            cycle(tree_count, role_count)
+            unresolved.extend(role_key(index) for index in range(role_count))
+        else:
+            role_map[role_key(0)] = STANDARD_TYPE
+    return role_map, cyclic, unresolved
+
+
+def answer_path(output_path: Path) -> Path:
+    return output_path.with_suffix(".json")
+
+
+def build_skeleton(pdf: pikepdf.Pdf) -> None:
+    pdf.Root.Metadata = build_xmp_metadata(pdf)
+
+    page = pdf.add_blank_page(page_size=(612, 792))
+    page.Contents = pikepdf.Stream(pdf, b"")
+
+    pdf.Root.StructTreeRoot = build_struct_tree_root(circular=False)
+
+
+def apply_variant(pdf: pikepdf.Pdf, circular: bool) -> None:
+    if circular:
+        pdf.Root.StructTreeRoot.RoleMap.Div = pikepdf.Name("/H1")
+
+
+@instrumented("structure")
+def build_scaled_pdf(role_map: dict[str, str]) -> pikepdf.Pdf:
     pdf = pikepdf.Pdf.new()
     pdf.Root.Metadata = build_xmp_metadata(pdf)
 
     page = pdf.add_blank_page(page_size=(612, 792))
     page.Contents = pikepdf.Stream(pdf, b"")
 
-    pdf.Root.StructTreeRoot = build_struct_tree_root(circular)
+    pdf.Root.StructTreeRoot = pikepdf.Dictionary(
+        Type=pikepdf.Name("/StructTreeRoot"),
+        RoleMap=pdf.make_indirect(
+            pikepdf.Dictionary({key: pikepdf.Name(value) for key, value in role_map.items()})
+        ),
+    )
+    return pdf
+
+
+def make_pdf_with_answer(
+    circular: bool,
+    role_count: int | None = None,
+    shape: str = "chain",
+    cycle_length: int = CYCLE_LENGTH,
+    cycle_depth: int = 0,
+    fan_in: int = FAN_IN,
+) -> tuple[pikepdf.Pdf, dict | None]:
+    # role_count=None keeps the original one- or two-entry RoleMap, which
+    # has no answer file.
+    if role_count is None:
+        pdf = clone_skeleton(__name__, build_skeleton)
+        apply_variant(pdf, circular)
+        return pdf, None
+
+    role_map, cyclic, unresolved = build_role_map(
+        role_count, shape, circular, cycle_length, cycle_depth, fan_in
+    )
+    answer = {
+        "role_count": role_count,
+        "cyclic_keys": cyclic,
+        "unresolved_keys": unresolved,
+    }
+    return build_scaled_pdf(role_map), answer
+
+
+def make_pdf(
+    circular: bool,
+    role_count: int | None = None,
+    shape: str = "chain",
+    cycle_length: int = CYCLE_LENGTH,
+    cycle_depth: int = 0,
+    fan_in: int = FAN_IN,
+) -> pikepdf.Pdf:
+    pdf, _ = make_pdf_with_answer(circular, role_count, shape, cycle_length, cycle_depth, fan_in)
+    return pdf
+
+
+def companion_outputs(output_path: Path, role_count: int | None = None, **params) -> list[Path]:
+    return [] if role_count is None else [answer_path(output_path)]
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    pdf.save(output_path, deterministic_id=True)
+
+def build_pdf(
+    output_path: Path,
+    circular: bool,
+    role_count: int | None = None,
+    shape: str = "chain",
+    cycle_length: int = CYCLE_LENGTH,
+    cycle_depth: int = 0,
+    fan_in: int = FAN_IN,
+) -> None:
+    pdf, answer = make_pdf_with_answer(
+        circular, role_count, shape, cycle_length, cycle_depth, fan_in
+    )
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+    if answer is not None:
+        # The expected answer travels next to the fixture, so validators
+        # can be checked key by key rather than only pass/fail.
+        write_output(answer_path(output_path), json.dumps(answer).encode())
+
+
+FIXTURES = [
+    (FAIL_PATH, {"circular": True}),
+    (PASS_PATH, {"circular": False}),
+]
+
+STRESS_FIXTURES = [
+    (
+        STRESS_DIR / f"mh_ua1-7.1-3_pass__A_circular_mapping_exists_{shape}_{count}.pdf",
+        {"circular": False, "role_count": count, "shape": shape},
+    )
+    for count in STRESS_ROLE_COUNTS
+    for shape in ROLE_MAP_SHAPES
+] + [
+    (
+        STRESS_DIR / f"mh_ua1-7.1-3_fail__A_circular_mapping_exists_{shape}_{count}.pdf",
+        {"circular": True, "role_count": count, "shape": shape},
+    )
+    for count in STRESS_ROLE_COUNTS
+    for shape in ROLE_MAP_SHAPES
+] + [
+    # A short cycle at the far end of a long chain, and one cycle through
+    # every key.
+    (
+        STRESS_DIR / f"mh_ua1-7.1-3_fail__A_circular_mapping_exists_chain_{count}_deep.pdf",
+        {"circular": True, "role_count": count, "cycle_depth": count - CYCLE_LENGTH},
+    )
+    for count in STRESS_ROLE_COUNTS
+] + [
+    (
+        STRESS_DIR / f"mh_ua1-7.1-3_fail__A_circular_mapping_exists_chain_{count}_whole.pdf",
+        {"circular": True, "role_count": count, "cycle_length": count},
+    )
+    for count in STRESS_ROLE_COUNTS
+]
 
 
 def main() -> None:
-    build_pdf(FAIL_PATH, circular=True)
-    build_pdf(PASS_PATH, circular=False)
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
@@ -1,19 +1,27 @@
 #!/usr/bin/env python3
+from functools import partial
 from pathlib import Path
 
 import pikepdf
 
+from cmap import SHIFT_JIS_CODESPACE, cmap_program, shift_jis_cid_ranges
+from font_cache import find_font_path, font_file_payload
+from font_subset import glyph_ids_in_content
+from save_profiles import save_pdf
+from skeleton import clone_skeleton
+from telemetry import instrumented
 
-def find_font_path() -> Path:
-    candidates = [
-        Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
-        Path("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"),
-        Path("/usr/share/fonts/truetype/freefont/FreeSans.ttf"),
-    ]
-    for path in candidates:
-        if path.exists():
-            return path
-    raise FileNotFoundError("No suitable TrueType font found on the system.")
+
+OUTPUT_DIR = Path("output/fonts_ua1_7_21_3_1")
+FAIL_PATH = OUTPUT_DIR / (
+    "mh_ua1-7.21.3-1_fail__CIDSystemInfo_Registry_mismatch.pdf"
+)
+PASS_PATH = OUTPUT_DIR / (
+    "mh_ua1-7.21.3-1_pass__CIDSystemInfo_Registry_mismatch.pdf"
+)
+STRESS_DIR = Path("output/stress/fonts_ua1_7_21_3_1")
+
+STRESS_CID_RANGE_COUNTS = (1_000, 20_000)
 
 
 def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
@@ -37,30 +45,41 @@ def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
-def build_cmap_stream(pdf: pikepdf.Pdf) -> pikepdf.Stream:
-    cmap_content = (
-        b"/CIDInit /ProcSet findresource begin\n"
-        b"12 dict begin\n"
-        b"begincmap\n"
-        b"/CMapName /TestCMap def\n"
-        b"/CMapType 1 def\n"
-        b"/WMode 0 def\n"
-        b"1 begincodespacerange\n"
-        b"<00> <FF>\n"
-        b"endcodespacerange\n"
-        b"1 beginbfchar\n"
-        b"<41> <0041>\n"
-        b"endbfchar\n"
-        b"endcmap\n"
-        b"CMapName currentdict /CMap defineresource pop\n"
-        b"end\n"
-        b"end\n"
-    )
+@instrumented("cmap")
+def build_cmap_stream(
+    pdf: pikepdf.Pdf,
+    cid_range_count: int | None = None,
+    registry: str = "RegistryB",
+) -> pikepdf.Stream:
+    if cid_range_count is None:
+        return pikepdf.Stream(
+            pdf,
+            cmap_program(
+                "TestCMap",
+                codespace_ranges=[(b"\x00", b"\xff")],
+                bf_chars=[(b"A", b"\x00A")],
+            ),
+            Type=pikepdf.Name("/CMap"),
+            CMapName=pikepdf.Name("/TestCMap"),
+            WMode=0,
+        )
+    # Shift-JIS-sized CMap carrying the Type0 side's CIDSystemInfo, in both
+    # the program and the stream dictionary.
     return pikepdf.Stream(
         pdf,
-        cmap_content,
+        cmap_program(
+            "TestCMap",
+            cid_system_info=(registry, "TestOrdering", 0),
+            codespace_ranges=SHIFT_JIS_CODESPACE,
+            cid_ranges=shift_jis_cid_ranges(cid_range_count),
+        ),
         Type=pikepdf.Name("/CMap"),
         CMapName=pikepdf.Name("/TestCMap"),
+        CIDSystemInfo=pikepdf.Dictionary(
+            Registry=pikepdf.String(registry),
+            Ordering=pikepdf.String("TestOrdering"),
+            Supplement=0,
+        ),
         WMode=0,
     )
 
@@ -70,13 +89,15 @@ def build_type0_font(
     cmap_stream: pikepdf.Stream,
     registry_type0: str,
     registry_cidfont: str,
+    glyph_ids: set[int] | None = None,
 ) -> pikepdf.Dictionary:
     font_path = find_font_path()
-    font_bytes = font_path.read_bytes()
+    font_data, font_length = font_file_payload(font_path, glyph_ids)
     font_file_stream = pikepdf.Stream(
         pdf,
-        font_bytes,
-        Length1=len(font_bytes),
+        font_data,
+        Filter=pikepdf.Name("/FlateDecode"),
+        Length1=font_length,
     )
 
     font_descriptor = pikepdf.Dictionary(
@@ -122,35 +143,99 @@ def build_type0_font(
     return pdf.make_indirect(type0_font)
 
 
-def build_pdf(output_path: Path, registry_type0: str, registry_cidfont: str) -> None:
-    pdf = pikepdf.Pdf.new()
-
-    cmap_stream = build_cmap_stream(pdf)
-    type0_font = build_type0_font(pdf, cmap_stream, registry_type0, registry_cidfont)
+def build_skeleton(
+    pdf: pikepdf.Pdf,
+    subset_font: bool,
+    cid_range_count: int | None = None,
+    cmap_registry: str = "RegistryB",
+) -> None:
+    content = b""
+    glyph_ids = glyph_ids_in_content(content) if subset_font else None
+
+    cmap_stream = build_cmap_stream(pdf, cid_range_count, cmap_registry)
+    type0_font = build_type0_font(
+        pdf, cmap_stream, "RegistryB", "RegistryB", glyph_ids
+    )
 
     page = pdf.add_blank_page(page_size=(612, 792))
     page.Resources = pikepdf.Dictionary(
         Font=pikepdf.Dictionary(F1=type0_font),
     )
-    page.Contents = pikepdf.Stream(pdf, b"")
+    page.Contents = pikepdf.Stream(pdf, content)
 
     pdf.Root.Metadata = build_xmp_metadata(pdf)
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    pdf.save(output_path, deterministic_id=True)
 
+def apply_variant(pdf: pikepdf.Pdf, registry_type0: str, registry_cidfont: str) -> None:
+    type0_font = pdf.pages[0].Resources.Font.F1
+    type0_font.CIDSystemInfo.Registry = pikepdf.String(registry_type0)
+    type0_font.DescendantFonts[0].CIDSystemInfo.Registry = pikepdf.String(registry_cidfont)
 
-def main() -> None:
-    base_dir = Path("output/fonts_ua1_7_21_3_1")
-    fail_path = base_dir / (
-        "mh_ua1-7.21.3-1_fail__CIDSystemInfo_Registry_mismatch.pdf"
+
+def make_pdf(
+    registry_type0: str,
+    registry_cidfont: str,
+    subset_font: bool = True,
+    cid_range_count: int | None = None,
+) -> pikepdf.Pdf:
+    # cid_range_count=None keeps the original one-entry CMap, shared by both
+    # variants through the skeleton.
+    if cid_range_count is not None:
+        pdf = pikepdf.Pdf.new()
+        build_skeleton(pdf, subset_font, cid_range_count, registry_type0)
+    else:
+        pdf = clone_skeleton(
+            (__name__, subset_font), partial(build_skeleton, subset_font=subset_font)
+        )
+    apply_variant(pdf, registry_type0, registry_cidfont)
+    return pdf
+
+
+def build_pdf(
+    output_path: Path,
+    registry_type0: str,
+    registry_cidfont: str,
+    subset_font: bool = True,
+    cid_range_count: int | None = None,
+) -> None:
+    pdf = make_pdf(registry_type0, registry_cidfont, subset_font, cid_range_count)
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {"registry_type0": "RegistryA", "registry_cidfont": "RegistryB"}),
+    (PASS_PATH, {"registry_type0": "RegistryB", "registry_cidfont": "RegistryB"}),
+]
+
+# The whole font program embedded, for measuring embedding memory.
+STRESS_FIXTURES = [
+    (
+        STRESS_DIR / "mh_ua1-7.21.3-1_fail__CIDSystemInfo_Registry_mismatch_full_font.pdf",
+        {"registry_type0": "RegistryA", "registry_cidfont": "RegistryB", "subset_font": False},
+    ),
+    (
+        STRESS_DIR / "mh_ua1-7.21.3-1_pass__CIDSystemInfo_Registry_mismatch_full_font.pdf",
+        {"registry_type0": "RegistryB", "registry_cidfont": "RegistryB", "subset_font": False},
+    ),
+] + [
+    (
+        STRESS_DIR / f"mh_ua1-7.21.3-1_fail__CIDSystemInfo_Registry_mismatch_cidranges_{count}.pdf",
+        {"registry_type0": "RegistryA", "registry_cidfont": "RegistryB", "cid_range_count": count},
     )
-    pass_path = base_dir / (
-        "mh_ua1-7.21.3-1_pass__CIDSystemInfo_Registry_mismatch.pdf"
+    for count in STRESS_CID_RANGE_COUNTS
+] + [
+    (
+        STRESS_DIR / f"mh_ua1-7.21.3-1_pass__CIDSystemInfo_Registry_mismatch_cidranges_{count}.pdf",
+        {"registry_type0": "RegistryB", "registry_cidfont": "RegistryB", "cid_range_count": count},
     )
+    for count in STRESS_CID_RANGE_COUNTS
+]
 
-    build_pdf(fail_path, registry_type0="RegistryA", registry_cidfont="RegistryB")
-    build_pdf(pass_path, registry_type0="RegistryB", registry_cidfont="RegistryB")
+
+def main() -> None:
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
@@ -3,39 +3,24 @@ from pathlib import Path
 
 import pikepdf
 
+from cmap import cmap_program
+from font_cache import find_font_path, font_file_payload
+from font_subset import glyph_ids_in_content
+from save_profiles import save_pdf
+from telemetry import instrumented
 
-def find_font_path() -> Path:
-    candidates = [
-        Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
-        Path("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"),
-        Path("/usr/share/fonts/truetype/freefont/FreeSans.ttf"),
-    ]
-    for path in candidates:
-        if path.exists():
-            return path
-    raise FileNotFoundError("No suitable TrueType font found on the system.")
 
+FAIL_PATH = Path("output/font_ua1_7_21_3_1/mh_ua1-7.21.3-1_fail.pdf")
 
+
+@instrumented("cmap")
 def build_cmap_stream(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     # Custom non-Identity CMap with explicit CIDSystemInfo.
-    cmap_content = (
-        b"/CIDInit /ProcSet findresource begin\n"
-        b"12 dict begin\n"
-        b"begincmap\n"
-        b"/CIDSystemInfo << /Registry (Test) /Ordering (Custom) /Supplement 0 >> def\n"
-        b"/CMapName /TestCMap def\n"
-        b"/CMapType 1 def\n"
-        b"/WMode 0 def\n"
-        b"1 begincodespacerange\n"
-        b"<00> <FF>\n"
-        b"endcodespacerange\n"
-        b"1 beginbfchar\n"
-        b"<41> <0041>\n"
-        b"endbfchar\n"
-        b"endcmap\n"
-        b"CMapName currentdict /CMap defineresource pop\n"
-        b"end\n"
-        b"end\n"
+    cmap_content = cmap_program(
+        "TestCMap",
+        cid_system_info=("Test", "Custom", 0),
+        codespace_ranges=[(b"\x00", b"\xff")],
+        bf_chars=[(b"A", b"\x00A")],
     )
     return pikepdf.Stream(
         pdf,
@@ -51,13 +36,18 @@ def build_cmap_stream(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
-def build_type0_font(pdf: pikepdf.Pdf, cmap_stream: pikepdf.Stream) -> pikepdf.Dictionary:
+def build_type0_font(
+    pdf: pikepdf.Pdf,
+    cmap_stream: pikepdf.Stream,
+    glyph_ids: set[int] | None = None,
+) -> pikepdf.Dictionary:
     font_path = find_font_path()
-    font_bytes = font_path.read_bytes()
+    font_data, font_length = font_file_payload(font_path, glyph_ids)
     font_file_stream = pikepdf.Stream(
         pdf,
-        font_bytes,
-        Length1=len(font_bytes),
+        font_data,
+        Filter=pikepdf.Name("/FlateDecode"),
+        Length1=font_length,
     )
 
     font_descriptor = pikepdf.Dictionary(
@@ -103,24 +93,39 @@ def build_type0_font(pdf: pikepdf.Pdf, cmap_stream: pikepdf.Stream) -> pikepdf.D
     return pdf.make_indirect(type0_font)
 
 
-def main() -> None:
-    output_path = Path(
-        "output/font_ua1_7_21_3_1/mh_ua1-7.21.3-1_fail.pdf"
-    )
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
+def make_pdf(subset_font: bool = True) -> pikepdf.Pdf:
     pdf = pikepdf.Pdf.new()
 
+    # Empty content stream to avoid any text drawing operators.
+    content = b""
+    glyph_ids = glyph_ids_in_content(content) if subset_font else None
+
     cmap_stream = build_cmap_stream(pdf)
-    type0_font = build_type0_font(pdf, cmap_stream)
+    type0_font = build_type0_font(pdf, cmap_stream, glyph_ids)
 
     page = pdf.add_blank_page(page_size=(612, 792))
     page.Resources = pikepdf.Dictionary(
         Font=pikepdf.Dictionary(F1=type0_font),
     )
-    # Empty content stream to avoid any text drawing operators.
-    page.Contents = pikepdf.Stream(pdf, b"")
-    pdf.save(output_path, deterministic_id=True)
+    page.Contents = pikepdf.Stream(pdf, content)
+
+    return pdf
+
+
+def build_pdf(output_path: Path, subset_font: bool = True) -> None:
+    pdf = make_pdf(subset_font)
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {}),
+]
+
+
+def main() -> None:
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
@@ -3,17 +3,15 @@ from pathlib import Path
 
 import pikepdf
 
+from cmap import cmap_program
+from font_cache import find_font_path, font_file_payload
+from font_subset import glyph_ids_in_content
+from parent_tree import ParentTreeBuilder
+from save_profiles import save_pdf
+from telemetry import instrumented
 
-def find_font_path() -> Path:
-    candidates = [
-        Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
-        Path("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"),
-        Path("/usr/share/fonts/truetype/freefont/FreeSans.ttf"),
-    ]
-    for path in candidates:
-        if path.exists():
-            return path
-    raise FileNotFoundError("No suitable TrueType font found on the system.")
+
+FAIL_PATH = Path("output/structure_ua1_7_21_3/mh_ua1-7.21.3-1_fail.pdf")
 
 
 def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
@@ -37,24 +35,12 @@ def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
+@instrumented("cmap")
 def build_encoding_cmap(pdf: pikepdf.Pdf) -> pikepdf.Stream:
-    cmap_content = (
-        b"/CIDInit /ProcSet findresource begin\n"
-        b"12 dict begin\n"
-        b"begincmap\n"
-        b"/CMapName /TestCMap def\n"
-        b"/CMapType 1 def\n"
-        b"/WMode 0 def\n"
-        b"1 begincodespacerange\n"
-        b"<00> <FF>\n"
-        b"endcodespacerange\n"
-        b"1 beginbfchar\n"
-        b"<41> <0041>\n"
-        b"endbfchar\n"
-        b"endcmap\n"
-        b"CMapName currentdict /CMap defineresource pop\n"
-        b"end\n"
-        b"end\n"
+    cmap_content = cmap_program(
+        "TestCMap",
+        codespace_ranges=[(b"\x00", b"\xff")],
+        bf_chars=[(b"A", b"\x00A")],
     )
     return pikepdf.Stream(
         pdf,
@@ -65,34 +51,26 @@ def build_encoding_cmap(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
+@instrumented("cmap")
 def build_tounicode_cmap(pdf: pikepdf.Pdf) -> pikepdf.Stream:
-    cmap_content = (
-        b"/CIDInit /ProcSet findresource begin\n"
-        b"12 dict begin\n"
-        b"begincmap\n"
-        b"/CMapName /ToUnicode def\n"
-        b"/CMapType 2 def\n"
-        b"1 begincodespacerange\n"
-        b"<00> <FF>\n"
-        b"endcodespacerange\n"
-        b"1 beginbfchar\n"
-        b"<41> <0041>\n"
-        b"endbfchar\n"
-        b"endcmap\n"
-        b"CMapName currentdict /CMap defineresource pop\n"
-        b"end\n"
-        b"end\n"
+    cmap_content = cmap_program(
+        "ToUnicode",
+        cmap_type=2,
+        wmode=None,
+        codespace_ranges=[(b"\x00", b"\xff")],
+        bf_chars=[(b"A", b"\x00A")],
     )
     return pikepdf.Stream(pdf, cmap_content)
 
 
-def build_type0_font(pdf: pikepdf.Pdf) -> pikepdf.Dictionary:
+def build_type0_font(pdf: pikepdf.Pdf, glyph_ids: set[int] | None = None) -> pikepdf.Dictionary:
     font_path = find_font_path()
-    font_bytes = font_path.read_bytes()
+    font_data, font_length = font_file_payload(font_path, glyph_ids)
     font_file_stream = pikepdf.Stream(
         pdf,
-        font_bytes,
-        Length1=len(font_bytes),
+        font_data,
+        Filter=pikepdf.Name("/FlateDecode"),
+        Length1=font_length,
     )
 
     font_descriptor = pdf.make_indirect(
@@ -143,6 +121,7 @@ def build_type0_font(pdf: pikepdf.Pdf) -> pikepdf.Dictionary:
     return pdf.make_indirect(type0_font)
 
 
+@instrumented("structure")
 def add_structure(pdf: pikepdf.Pdf, page: pikepdf.Page) -> None:
     struct_tree_root = pdf.make_indirect(
         pikepdf.Dictionary(Type=pikepdf.Name("/StructTreeRoot"))
@@ -153,31 +132,22 @@ def add_structure(pdf: pikepdf.Pdf, page: pikepdf.Page) -> None:
             Type=pikepdf.Name("/StructElem"),
             S=pikepdf.Name("/P"),
             P=struct_tree_root,
-            K=0,
             PG=page.obj,
         )
     )
 
-    parent_tree = pdf.make_indirect(
-        pikepdf.Dictionary(Nums=[0, [struct_elem]])
-    )
+    parent_tree = ParentTreeBuilder()
+    struct_elem.K = parent_tree.add_marked_content(parent_tree.add_page(page), struct_elem)
 
     struct_tree_root.K = [struct_elem]
-    struct_tree_root.ParentTree = parent_tree
+    struct_tree_root.ParentTree = parent_tree.build(pdf)
 
     pdf.Root.StructTreeRoot = struct_tree_root
-    page.StructParents = 0
 
 
-def build_pdf(output_path: Path) -> None:
+def make_pdf(subset_font: bool = True) -> pikepdf.Pdf:
     pdf = pikepdf.Pdf.new()
 
-    page = pdf.add_blank_page(page_size=(612, 792))
-    type0_font = build_type0_font(pdf)
-    page.Resources = pikepdf.Dictionary(
-        Font=pikepdf.Dictionary(F1=type0_font),
-    )
-
     content = (
         b"/P << /MCID 0 >> BDC\n"
         b"BT\n"
@@ -187,6 +157,14 @@ def build_pdf(output_path: Path) -> None:
         b"ET\n"
         b"EMC\n"
     )
+    glyph_ids = glyph_ids_in_content(content) if subset_font else None
+
+    page = pdf.add_blank_page(page_size=(612, 792))
+    type0_font = build_type0_font(pdf, glyph_ids)
+    page.Resources = pikepdf.Dictionary(
+        Font=pikepdf.Dictionary(F1=type0_font),
+    )
+
     page.Contents = pikepdf.Stream(pdf, content)
 
     add_structure(pdf, page)
@@ -196,13 +174,23 @@ def build_pdf(output_path: Path) -> None:
     pdf.Root.Lang = pikepdf.String("en-US")
     pdf.Root.Metadata = build_xmp_metadata(pdf)
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    pdf.save(output_path, deterministic_id=True)
+    return pdf
+
+
+def build_pdf(output_path: Path, subset_font: bool = True) -> None:
+    pdf = make_pdf(subset_font)
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {}),
+]
 
 
 def main() -> None:
-    output_path = Path("output/structure_ua1_7_21_3/mh_ua1-7.21.3-1_fail.pdf")
-    build_pdf(output_path)
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
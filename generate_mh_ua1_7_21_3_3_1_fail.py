@@ -1,43 +1,62 @@
 #!/usr/bin/env python3
-import os
 from pathlib import Path
 
 import pikepdf
 
+from cmap import SHIFT_JIS_CODESPACE, cmap_program, shift_jis_cid_ranges
+from font_cache import find_font_path, font_file_payload
+from font_subset import glyph_ids_in_content
+from save_profiles import save_pdf
+from telemetry import instrumented
 
-def find_font_path() -> Path:
-    candidates = [
-        Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
-        Path("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"),
-        Path("/usr/share/fonts/truetype/freefont/FreeSans.ttf"),
-    ]
-    for path in candidates:
-        if path.exists():
-            return path
-    raise FileNotFoundError("No suitable TrueType font found on the system.")
 
+FAIL_PATH = Path("output/cmap_ua1_7_21_3_3/mh_ua1-7.21.3.3-1_fail.pdf")
+OVERRIDE_PATH = Path("output/cmap_ua1_7_21_3_3/mh_ua1-7.21.3.3-1_fail__CMap_cidchar_override.pdf")
+STRESS_DIR = Path("output/stress/cmap_ua1_7_21_3_3")
 
-def build_cmap_stream(pdf: pikepdf.Pdf) -> pikepdf.Stream:
+STRESS_CID_RANGE_COUNTS = (1_000, 20_000)
+# A two-byte codespace that stops at lead byte 0x9F, so most of the
+# Shift-JIS-sized cidranges map codes outside it.
+MISMATCHED_CODESPACE = [(b"\x00", b"\x80"), (b"\x81\x40", b"\x9f\xfe")]
+
+
+@instrumented("cmap")
+def build_cmap_stream(
+    pdf: pikepdf.Pdf,
+    cid_range_count: int | None = None,
+    cid_char_override: bool = False,
+    codespace_mismatch: bool = False,
+) -> pikepdf.Stream:
     # /WMode mismatch: dictionary says 0, stream defines 1.
-    cmap_content = (
-        b"/CIDInit /ProcSet findresource begin\n"
-        b"12 dict begin\n"
-        b"begincmap\n"
-        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> def\n"
-        b"/CMapName /TestCMap def\n"
-        b"/CMapType 1 def\n"
-        b"/WMode 1 def\n"
-        b"1 begincodespacerange\n"
-        b"<00> <FF>\n"
-        b"endcodespacerange\n"
-        b"1 beginbfchar\n"
-        b"<41> <0041>\n"
-        b"endbfchar\n"
-        b"endcmap\n"
-        b"CMapName currentdict /CMap defineresource pop\n"
-        b"end\n"
-        b"end\n"
-    )
+    if cid_char_override:
+        # A cidchar overriding one code inside a cidrange, as real CMaps
+        # often do; <41> still maps to CID 0x41.
+        cmap_content = cmap_program(
+            "TestCMap",
+            wmode=1,
+            cid_system_info=("Adobe", "Identity", 0),
+            codespace_ranges=[(b"\x00", b"\xff")],
+            cid_ranges=[(b"\x20", b"\x7e", 0x1020)],
+            cid_chars=[(b"A", 0x41)],
+        )
+    elif cid_range_count is None:
+        cmap_content = cmap_program(
+            "TestCMap",
+            wmode=1,
+            cid_system_info=("Adobe", "Identity", 0),
+            codespace_ranges=[(b"\x00", b"\xff")],
+            bf_chars=[(b"A", b"\x00A")],
+        )
+    else:
+        # Shift-JIS-sized CMap, optionally with cidranges outside its own
+        # codespace as well.
+        cmap_content = cmap_program(
+            "TestCMap",
+            wmode=1,
+            cid_system_info=("Adobe", "Identity", 0),
+            codespace_ranges=MISMATCHED_CODESPACE if codespace_mismatch else SHIFT_JIS_CODESPACE,
+            cid_ranges=shift_jis_cid_ranges(cid_range_count),
+        )
     return pikepdf.Stream(
         pdf,
         cmap_content,
@@ -52,13 +71,18 @@ def build_cmap_stream(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
-def build_type0_font(pdf: pikepdf.Pdf, cmap_stream: pikepdf.Stream) -> pikepdf.Dictionary:
+def build_type0_font(
+    pdf: pikepdf.Pdf,
+    cmap_stream: pikepdf.Stream,
+    glyph_ids: set[int] | None = None,
+) -> pikepdf.Dictionary:
     font_path = find_font_path()
-    font_bytes = font_path.read_bytes()
+    font_data, font_length = font_file_payload(font_path, glyph_ids)
     font_file_stream = pikepdf.Stream(
         pdf,
-        font_bytes,
-        Length1=len(font_bytes),
+        font_data,
+        Filter=pikepdf.Name("/FlateDecode"),
+        Length1=font_length,
     )
 
     font_descriptor = pikepdf.Dictionary(
@@ -99,28 +123,66 @@ def build_type0_font(pdf: pikepdf.Pdf, cmap_stream: pikepdf.Stream) -> pikepdf.D
     return pdf.make_indirect(type0_font)
 
 
-def main() -> None:
-    output_path = Path(
-        "output/cmap_ua1_7_21_3_3/mh_ua1-7.21.3.3-1_fail.pdf"
-    )
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
+def make_pdf(
+    subset_font: bool = True,
+    cid_range_count: int | None = None,
+    cid_char_override: bool = False,
+    codespace_mismatch: bool = False,
+) -> pikepdf.Pdf:
     pdf = pikepdf.Pdf.new()
 
-    cmap_stream = build_cmap_stream(pdf)
-    type0_font = build_type0_font(pdf, cmap_stream)
+    content_bytes = b"BT\n/F1 12 Tf\n100 700 Td\n<41> Tj\nET\n"
+    glyph_ids = glyph_ids_in_content(content_bytes) if subset_font else None
 
-    content = pikepdf.Stream(
-        pdf,
-        b"BT\n/F1 12 Tf\n100 700 Td\n<41> Tj\nET\n",
-    )
+    cmap_stream = build_cmap_stream(pdf, cid_range_count, cid_char_override, codespace_mismatch)
+    type0_font = build_type0_font(pdf, cmap_stream, glyph_ids)
+
+    content = pikepdf.Stream(pdf, content_bytes)
 
     page = pdf.add_blank_page(page_size=(612, 792))
     page.Resources = pikepdf.Dictionary(
         Font=pikepdf.Dictionary(F1=type0_font),
     )
     page.Contents = content
-    pdf.save(output_path)
+
+    return pdf
+
+
+def build_pdf(
+    output_path: Path,
+    subset_font: bool = True,
+    cid_range_count: int | None = None,
+    cid_char_override: bool = False,
+    codespace_mismatch: bool = False,
+) -> None:
+    pdf = make_pdf(subset_font, cid_range_count, cid_char_override, codespace_mismatch)
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {}),
+    (OVERRIDE_PATH, {"cid_char_override": True}),
+]
+
+STRESS_FIXTURES = [
+    (
+        STRESS_DIR / f"mh_ua1-7.21.3.3-1_fail__CMap_WMode_mismatch_{count}.pdf",
+        {"cid_range_count": count},
+    )
+    for count in STRESS_CID_RANGE_COUNTS
+] + [
+    (
+        STRESS_DIR / f"mh_ua1-7.21.3.3-1_fail__CMap_codespace_mismatch_{count}.pdf",
+        {"cid_range_count": count, "codespace_mismatch": True},
+    )
+    for count in STRESS_CID_RANGE_COUNTS
+]
+
+
+def main() -> None:
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
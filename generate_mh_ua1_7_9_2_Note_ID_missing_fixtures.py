@@ -3,10 +3,22 @@ from pathlib import Path
 
 import pikepdf
 
+from note_structure import NOTES_PER_PAGE, build_scaled_notes, is_note_at
+from parent_tree import DEFAULT_FAN_OUT
+from save_profiles import save_pdf
+from skeleton import clone_skeleton
+from telemetry import instrumented
+
 
 OUTPUT_DIR = Path("output/notes_ua1_7_9_2")
 FAIL_PATH = OUTPUT_DIR / "mh_ua1-7.9-2_fail__Note_ID_missing.pdf"
 PASS_PATH = OUTPUT_DIR / "mh_ua1-7.9-2_pass__Note_ID_missing.pdf"
+STRESS_DIR = Path("output/stress/notes_ua1_7_9_2")
+
+# Which Note has no ID: the second Note, the one in the middle, the last
+# one, or every second Note.
+MISSING_POSITIONS = ("first", "middle", "last", "many")
+STRESS_NOTE_COUNTS = (10, 1_000, 100_000, 1_000_000)
 
 
 def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
@@ -30,6 +42,7 @@ def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
+@instrumented("structure")
 def build_structure(pdf: pikepdf.Pdf, page: pikepdf.Page, include_id: bool) -> None:
     struct_tree_root = pdf.make_indirect(
         pikepdf.Dictionary(Type=pikepdf.Name("/StructTreeRoot"))
@@ -50,20 +63,94 @@ def build_structure(pdf: pikepdf.Pdf, page: pikepdf.Page, include_id: bool) -> N
     pdf.Root.StructTreeRoot = struct_tree_root
 
 
-def build_pdf(output_path: Path, include_id: bool) -> None:
-    pdf = pikepdf.Pdf.new()
+def build_skeleton(pdf: pikepdf.Pdf) -> None:
     pdf.Root.Metadata = build_xmp_metadata(pdf)
 
     page = pdf.add_blank_page(page_size=(612, 792))
-    build_structure(pdf, page, include_id)
+    build_structure(pdf, page, include_id=True)
+
+
+def apply_variant(pdf: pikepdf.Pdf, include_id: bool) -> None:
+    if not include_id:
+        del pdf.Root.StructTreeRoot.K[0].ID
+
+
+@instrumented("structure")
+def build_scaled_document(
+    pdf: pikepdf.Pdf,
+    note_count: int,
+    include_id: bool,
+    missing_at: str,
+    notes_per_page: int,
+    parent_tree_fan_out: int = DEFAULT_FAN_OUT,
+) -> None:
+    # Unless include_id, each Note at missing_at has no ID.
+    def note_id(index: int) -> str | None:
+        if not include_id and is_note_at(index, note_count, missing_at):
+            return None
+        return f"note-{index + 1}"
+
+    build_scaled_notes(pdf, note_count, note_id, notes_per_page, parent_tree_fan_out)
+
+
+def make_pdf(
+    include_id: bool,
+    note_count: int | None = None,
+    missing_at: str = "last",
+    notes_per_page: int = NOTES_PER_PAGE,
+    parent_tree_fan_out: int = DEFAULT_FAN_OUT,
+) -> pikepdf.Pdf:
+    # note_count=None keeps the original one-Note document.
+    if note_count is None:
+        pdf = clone_skeleton(__name__, build_skeleton)
+        apply_variant(pdf, include_id)
+        return pdf
+
+    pdf = pikepdf.Pdf.new()
+    pdf.Root.Metadata = build_xmp_metadata(pdf)
+    build_scaled_document(
+        pdf, note_count, include_id, missing_at, notes_per_page, parent_tree_fan_out
+    )
+    return pdf
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    pdf.save(output_path, deterministic_id=True)
+
+def build_pdf(
+    output_path: Path,
+    include_id: bool,
+    note_count: int | None = None,
+    missing_at: str = "last",
+    notes_per_page: int = NOTES_PER_PAGE,
+    parent_tree_fan_out: int = DEFAULT_FAN_OUT,
+) -> None:
+    pdf = make_pdf(include_id, note_count, missing_at, notes_per_page, parent_tree_fan_out)
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {"include_id": False}),
+    (PASS_PATH, {"include_id": True}),
+]
+
+STRESS_FIXTURES = [
+    (
+        STRESS_DIR / f"mh_ua1-7.9-2_pass__Note_ID_missing_{count}.pdf",
+        {"include_id": True, "note_count": count},
+    )
+    for count in STRESS_NOTE_COUNTS
+] + [
+    (
+        STRESS_DIR / f"mh_ua1-7.9-2_fail__Note_ID_missing_{count}_{position}.pdf",
+        {"include_id": False, "note_count": count, "missing_at": position},
+    )
+    for count in STRESS_NOTE_COUNTS
+    for position in MISSING_POSITIONS
+]
 
 
 def main() -> None:
-    build_pdf(FAIL_PATH, include_id=False)
-    build_pdf(PASS_PATH, include_id=True)
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
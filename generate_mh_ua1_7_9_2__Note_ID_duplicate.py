@@ -3,10 +3,22 @@ from pathlib import Path
 
 import pikepdf
 
+from note_structure import NOTES_PER_PAGE, build_scaled_notes, is_note_at
+from parent_tree import DEFAULT_FAN_OUT, ParentTreeBuilder
+from save_profiles import save_pdf
+from skeleton import clone_skeleton
+from telemetry import instrumented
+
 
 OUTPUT_DIR = Path("output/structure_ua1_7_9_2")
 FAIL_PATH = OUTPUT_DIR / "mh_ua1-7.9-2_fail__Note_ID_duplicate.pdf"
 PASS_PATH = OUTPUT_DIR / "mh_ua1-7.9-2_pass__Note_ID_unique.pdf"
+STRESS_DIR = Path("output/stress/structure_ua1_7_9_2")
+
+# Which Note repeats its predecessor's ID: the second Note, the one in the
+# middle, the last one, or every second Note.
+DUPLICATE_POSITIONS = ("first", "middle", "last", "many")
+STRESS_NOTE_COUNTS = (10, 1_000, 100_000, 1_000_000)
 
 
 def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
@@ -30,6 +42,7 @@ def build_xmp_metadata(pdf: pikepdf.Pdf) -> pikepdf.Stream:
     )
 
 
+@instrumented("structure")
 def build_structure(
     pdf: pikepdf.Pdf,
     page: pikepdf.Page,
@@ -42,40 +55,31 @@ def build_structure(
     note_id_first = pikepdf.String("note-1")
     note_id_second = pikepdf.String("note-1" if duplicate_ids else "note-2")
 
-    struct_elem_one = pdf.make_indirect(
-        pikepdf.Dictionary(
-            Type=pikepdf.Name("/StructElem"),
-            S=pikepdf.Name("/Note"),
-            P=struct_tree_root,
-            PG=page.obj,
-            K=0,
-            ID=note_id_first,
-        )
-    )
-    struct_elem_two = pdf.make_indirect(
-        pikepdf.Dictionary(
-            Type=pikepdf.Name("/StructElem"),
-            S=pikepdf.Name("/Note"),
-            P=struct_tree_root,
-            PG=page.obj,
-            K=1,
-            ID=note_id_second,
+    parent_tree = ParentTreeBuilder()
+    page_key = parent_tree.add_page(page)
+    notes = []
+    for note_id in (note_id_first, note_id_second):
+        note = pdf.make_indirect(
+            pikepdf.Dictionary(
+                Type=pikepdf.Name("/StructElem"),
+                S=pikepdf.Name("/Note"),
+                P=struct_tree_root,
+                PG=page.obj,
+                ID=note_id,
+            )
         )
-    )
-
-    parent_tree = pdf.make_indirect(
-        pikepdf.Dictionary(Nums=[0, [struct_elem_one, struct_elem_two]])
-    )
+        note.K = parent_tree.add_marked_content(page_key, note)
+        notes.append(note)
 
-    struct_tree_root.K = [struct_elem_one, struct_elem_two]
-    struct_tree_root.ParentTree = parent_tree
+    struct_tree_root.K = notes
+    struct_tree_root.ParentTree = parent_tree.build(pdf)
 
     pdf.Root.StructTreeRoot = struct_tree_root
     pdf.Root.MarkInfo = pikepdf.Dictionary(Marked=True)
     pdf.Root.Lang = pikepdf.String("en-US")
-    page.StructParents = 0
 
 
+@instrumented("content")
 def build_page_content(pdf: pikepdf.Pdf, page: pikepdf.Page) -> None:
     page.Resources = pikepdf.Dictionary(
         Font=pikepdf.Dictionary(
@@ -106,21 +110,98 @@ def build_page_content(pdf: pikepdf.Pdf, page: pikepdf.Page) -> None:
     page.Contents = pikepdf.Stream(pdf, content)
 
 
-def build_pdf(output_path: Path, duplicate_ids: bool) -> None:
-    pdf = pikepdf.Pdf.new()
+@instrumented("structure")
+def build_scaled_document(
+    pdf: pikepdf.Pdf,
+    note_count: int,
+    duplicate_ids: bool,
+    duplicate_at: str,
+    notes_per_page: int,
+    parent_tree_fan_out: int = DEFAULT_FAN_OUT,
+) -> None:
+    # With duplicate_ids, each Note at duplicate_at repeats its
+    # predecessor's ID.
+    def note_id(index: int) -> str:
+        if duplicate_ids and is_note_at(index, note_count, duplicate_at):
+            index -= 1
+        return f"note-{index + 1}"
+
+    build_scaled_notes(pdf, note_count, note_id, notes_per_page, parent_tree_fan_out)
+
+
+def build_skeleton(pdf: pikepdf.Pdf) -> None:
     pdf.Root.Metadata = build_xmp_metadata(pdf)
 
     page = pdf.add_blank_page(page_size=(612, 792))
     build_page_content(pdf, page)
-    build_structure(pdf, page, duplicate_ids)
+    build_structure(pdf, page, duplicate_ids=False)
+
+
+def apply_variant(pdf: pikepdf.Pdf, duplicate_ids: bool) -> None:
+    if duplicate_ids:
+        pdf.Root.StructTreeRoot.K[1].ID = pikepdf.String("note-1")
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    pdf.save(output_path, deterministic_id=True)
+
+def make_pdf(
+    duplicate_ids: bool,
+    note_count: int | None = None,
+    duplicate_at: str = "last",
+    notes_per_page: int = NOTES_PER_PAGE,
+    parent_tree_fan_out: int = DEFAULT_FAN_OUT,
+) -> pikepdf.Pdf:
+    # note_count=None keeps the original two-Note, one-page document.
+    if note_count is None:
+        pdf = clone_skeleton(__name__, build_skeleton)
+        apply_variant(pdf, duplicate_ids)
+        return pdf
+
+    pdf = pikepdf.Pdf.new()
+    pdf.Root.Metadata = build_xmp_metadata(pdf)
+    build_scaled_document(
+        pdf, note_count, duplicate_ids, duplicate_at, notes_per_page, parent_tree_fan_out
+    )
+    return pdf
+
+
+def build_pdf(
+    output_path: Path,
+    duplicate_ids: bool,
+    note_count: int | None = None,
+    duplicate_at: str = "last",
+    notes_per_page: int = NOTES_PER_PAGE,
+    parent_tree_fan_out: int = DEFAULT_FAN_OUT,
+) -> None:
+    pdf = make_pdf(
+        duplicate_ids, note_count, duplicate_at, notes_per_page, parent_tree_fan_out
+    )
+
+    save_pdf(pdf, output_path, deterministic_id=True)
+
+
+FIXTURES = [
+    (FAIL_PATH, {"duplicate_ids": True}),
+    (PASS_PATH, {"duplicate_ids": False}),
+]
+
+STRESS_FIXTURES = [
+    (
+        STRESS_DIR / f"mh_ua1-7.9-2_pass__Note_ID_unique_{count}.pdf",
+        {"duplicate_ids": False, "note_count": count},
+    )
+    for count in STRESS_NOTE_COUNTS
+] + [
+    (
+        STRESS_DIR / f"mh_ua1-7.9-2_fail__Note_ID_duplicate_{count}_{position}.pdf",
+        {"duplicate_ids": True, "note_count": count, "duplicate_at": position},
+    )
+    for count in STRESS_NOTE_COUNTS
+    for position in DUPLICATE_POSITIONS
+]
 
 
 def main() -> None:
-    build_pdf(FAIL_PATH, duplicate_ids=True)
-    build_pdf(PASS_PATH, duplicate_ids=False)
+    for output_path, params in FIXTURES:
+        build_pdf(output_path, **params)
 
 
 if __name__ == "__main__":
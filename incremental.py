@@ -0,0 +1,161 @@
+import hashlib
+import io
+import re
+from collections.abc import Callable
+from pathlib import Path
+
+import pikepdf
+
+from output_store import write_output
+
+
+STARTXREF_RE = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
+
+
+def find_startxref(data: bytes) -> int:
+    match = STARTXREF_RE.search(data[-1024:])
+    if match is None:
+        raise ValueError("base document has no trailing startxref")
+    return int(match[1])
+
+
+def _fingerprint(obj: pikepdf.Object) -> tuple:
+    if isinstance(obj, pikepdf.Stream):
+        return (
+            obj.stream_dict.unparse(resolved=True),
+            hashlib.sha256(obj.read_raw_bytes()).digest(),
+        )
+    return (obj.unparse(resolved=True),)
+
+
+def _serialize(obj: pikepdf.Object) -> bytes:
+    number, generation = obj.objgen
+    header = f"{number} {generation} obj\n".encode()
+    if not isinstance(obj, pikepdf.Stream):
+        return header + obj.unparse(resolved=True) + b"\nendobj\n"
+    raw = obj.read_raw_bytes()
+    stream_dict = pikepdf.Dictionary(dict(obj.stream_dict.items()))
+    stream_dict.Length = len(raw)
+    return (
+        header
+        + stream_dict.unparse()
+        + b"\nstream\n"
+        + raw
+        + b"\nendstream\nendobj\n"
+    )
+
+
+def _subsections(numbers: list[int]) -> list[tuple[int, int]]:
+    ranges = []
+    for number in numbers:
+        if ranges and ranges[-1][0] + ranges[-1][1] == number:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + 1)
+        else:
+            ranges.append((number, 1))
+    return ranges
+
+
+def _trailer_entries(pdf: pikepdf.Pdf, size: int, prev: int, update_id: bytes) -> dict:
+    trailer = {"/Size": size, "/Prev": prev, "/Root": pdf.Root}
+    if "/Info" in pdf.trailer:
+        trailer["/Info"] = pdf.trailer.Info
+    if "/ID" in pdf.trailer:
+        trailer["/ID"] = [pdf.trailer.ID[0], pikepdf.String(update_id)]
+    return trailer
+
+
+def incremental_update(
+    base: bytes,
+    apply: Callable[[pikepdf.Pdf], object],
+    diff: bool = True,
+) -> bytes:
+    # Returns only the bytes to append to ``base``: the objects ``apply``
+    # changed or created, a cross-reference section for them chained to the
+    # original one through /Prev, and a new trailer. The xref form (table
+    # or stream) follows the base document's. With ``diff`` false, ``apply``
+    # returns the indirect objects it changed instead of every object being
+    # fingerprinted, so objects it never touches are never parsed.
+    prev = find_startxref(base)
+    uses_xref_stream = not base[prev:prev + 4] == b"xref"
+
+    pdf = pikepdf.open(io.BytesIO(base))
+    if "/Encrypt" in pdf.trailer:
+        raise ValueError("cannot append an unencrypted update to an encrypted document")
+    if diff:
+        before = {obj.objgen: _fingerprint(obj) for obj in pdf.objects}
+        apply(pdf)
+        changed = [
+            obj
+            for obj in pdf.objects
+            if before.get(obj.objgen) != _fingerprint(obj)
+        ]
+    else:
+        changed = list({obj.objgen: obj for obj in apply(pdf)}.values())
+    if not changed:
+        raise ValueError("the mutation did not change any object")
+
+    body = io.BytesIO()
+    if not base.endswith(b"\n"):
+        body.write(b"\n")
+    offsets = {}
+    for obj in sorted(changed, key=lambda obj: obj.objgen):
+        offsets[obj.objgen] = len(base) + body.tell()
+        body.write(_serialize(obj))
+
+    size = max(int(pdf.trailer.Size), max(number for number, _ in offsets) + 1)
+    update_id = hashlib.md5(body.getvalue()).digest()
+    xref_offset = len(base) + body.tell()
+
+    if uses_xref_stream:
+        xref_number = size
+        size += 1
+        offsets[(xref_number, 0)] = xref_offset
+        numbers = sorted(number for number, _ in offsets)
+        rows = b"".join(
+            b"\x01" + offsets[(number, generation)].to_bytes(4, "big") + generation.to_bytes(2, "big")
+            for number, generation in sorted(offsets)
+        )
+        trailer = _trailer_entries(pdf, size, prev, update_id)
+        xref_dict = pikepdf.Dictionary(
+            Type=pikepdf.Name("/XRef"),
+            W=[1, 4, 2],
+            Index=[value for section in _subsections(numbers) for value in section],
+            Length=len(rows),
+            **{key[1:]: value for key, value in trailer.items()},
+        )
+        body.write(
+            f"{xref_number} 0 obj\n".encode()
+            + xref_dict.unparse()
+            + b"\nstream\n"
+            + rows
+            + b"\nendstream\nendobj\n"
+        )
+    else:
+        by_number = {
+            number: (offset, generation)
+            for (number, generation), offset in offsets.items()
+        }
+        body.write(b"xref\n")
+        for start, count in _subsections(sorted(by_number)):
+            body.write(f"{start} {count}\n".encode())
+            for number in range(start, start + count):
+                offset, generation = by_number[number]
+                body.write(f"{offset:010d} {generation:05d} n \n".encode())
+        trailer = pikepdf.Dictionary(_trailer_entries(pdf, size, prev, update_id))
+        body.write(b"trailer\n" + trailer.unparse() + b"\n")
+
+    body.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+    return body.getvalue()
+
+
+def write_incremental(
+    base_path: Path,
+    output_path: Path,
+    apply: Callable[[pikepdf.Pdf], object],
+    delta_only: bool = False,
+    diff: bool = True,
+) -> int:
+    base = base_path.read_bytes()
+    delta = incremental_update(base, apply, diff)
+    write_output(output_path, delta if delta_only else base + delta)
+    return len(delta)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from mutations import MUTATIONS, mutate, mutated_path, violates
+
+
+DEFAULT_OUTPUT_DIR = Path("output/injected")
+MANIFEST_NAME = "manifest.jsonl"
+# Workers are replaced after this many inputs, so memory a large document
+# leaves fragmented in one worker is returned to the system.
+MAX_TASKS_PER_WORKER = 16
+
+
+def find_inputs(input_dir: Path) -> list[Path]:
+    return sorted(path for path in input_dir.rglob("*") if path.suffix.lower() == ".pdf")
+
+
+def _limit_memory(max_memory_mb: int | None) -> None:
+    # Caps each worker's address space: a document too large for it fails
+    # with MemoryError and is recorded, instead of exhausting the host.
+    if max_memory_mb:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def new_result(input_path: Path, relative: Path, name: str, output_dir: Path) -> dict:
+    # The input's size and mtime let a later run tell whether it changed.
+    stat = input_path.stat()
+    return {
+        "input": str(input_path),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "mutation": name,
+        "rule": MUTATIONS[name].rule,
+        "output": str(mutated_path(relative, name, output_dir / relative.parent)),
+    }
+
+
+def inject(
+    input_path: Path,
+    relative: Path,
+    names: list[str],
+    output_dir: Path,
+    check: bool,
+) -> list[dict]:
+    # Applies each mutation to the input separately. A document without the
+    # feature a mutation needs is skipped for that mutation; any other
+    # failure, including the AttributeError or KeyError a malformed
+    # document raises, is an error for it alone.
+    results = []
+    for name in names:
+        result = new_result(input_path, relative, name, output_dir)
+        output_path = Path(result["output"])
+        start = time.perf_counter()
+        try:
+            mutate(input_path, output_path, name)
+            result.update(status="ok", bytes=output_path.stat().st_size)
+            if check:
+                result["violates"] = violates(output_path, name)
+        except LookupError as exc:
+            result.update(status="skipped", reason=str(exc))
+        except Exception as exc:
+            result.update(status="error", reason=f"{type(exc).__name__}: {exc}")
+        result["seconds"] = round(time.perf_counter() - start, 4)
+        results.append(result)
+    return results
+
+
+def load_manifest(manifest_path: Path) -> dict[tuple[str, str], dict]:
+    # Later lines win; a line cut short by an interrupted run is ignored.
+    entries = {}
+    if not manifest_path.exists():
+        return entries
+    with manifest_path.open() as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["input"], entry["mutation"]] = entry
+    return entries
+
+
+def is_done(entry: dict | None, input_path: Path) -> bool:
+    # Only a confirmed violation or an explicit skip is final: errors and
+    # outputs the oracle found compliant are retried.
+    if entry is None or entry["status"] not in ("ok", "skipped") or entry.get("violates") is False:
+        return False
+    stat = input_path.stat()
+    if (entry["input_size"], entry["input_mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+        return False
+    return entry["status"] == "skipped" or Path(entry["output"]).exists()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Inject rule violations into every PDF under a directory.",
+    )
+    parser.add_argument("input_dir", type=Path, help="directory of valid PDF/UA documents")
+    parser.add_argument(
+        "-m",
+        "--mutation",
+        action="append",
+        choices=sorted(MUTATIONS),
+        help="violation to apply to each document (may be repeated; default: all)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        default=DEFAULT_OUTPUT_DIR,
+        help=f"where fail fixtures and {MANIFEST_NAME} are written, mirroring the "
+        f"input tree (default: {DEFAULT_OUTPUT_DIR})",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        metavar="MB",
+        help="address-space limit per worker process",
+    )
+    parser.add_argument(
+        "--no-check",
+        dest="check",
+        action="store_false",
+        help="do not confirm each output with the rule's check_fixtures oracle",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="redo inputs the manifest already records as done",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    names = args.mutation or sorted(MUTATIONS)
+    manifest_path = args.output_dir / MANIFEST_NAME
+    entries = {} if args.force else load_manifest(manifest_path)
+
+    tasks = []
+    for input_path in find_inputs(args.input_dir):
+        pending = [
+            name
+            for name in names
+            if not is_done(entries.get((str(input_path), name)), input_path)
+        ]
+        if pending:
+            tasks.append((input_path, input_path.relative_to(args.input_dir), pending))
+
+    start = time.perf_counter()
+    counts = Counter()
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    with (
+        manifest_path.open("a") as manifest,
+        ProcessPoolExecutor(
+            max_workers=max(args.jobs, 1),
+            max_tasks_per_child=MAX_TASKS_PER_WORKER,
+            initializer=_limit_memory,
+            initargs=(args.max_memory,),
+        ) as executor,
+    ):
+        futures = {
+            executor.submit(
+                inject, input_path, relative, pending, args.output_dir, args.check
+            ): (input_path, relative, pending)
+            for input_path, relative, pending in tasks
+        }
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as exc:
+                # The worker itself died (a crash in qpdf, say).
+                input_path, relative, pending = futures[future]
+                results = [
+                    {
+                        **new_result(input_path, relative, name, args.output_dir),
+                        "status": "error",
+                        "reason": f"{type(exc).__name__}: {exc}",
+                    }
+                    for name in pending
+                ]
+            for result in results:
+                # One write per result, so an interrupted run resumes here.
+                manifest.write(json.dumps(result, sort_keys=True) + "\n")
+                manifest.flush()
+                status = result["status"]
+                if result.get("violates") is False:
+                    status = "not violated"
+                    print(f"NOT VIOLATED {result['output']}", file=sys.stderr)
+                elif status == "error":
+                    print(
+                        f"ERROR {result['input']} {result['mutation']}: {result['reason']}",
+                        file=sys.stderr,
+                    )
+                counts[result["mutation"], status] += 1
+
+    print(f"{'mutation':<24} {'ok':>8} {'skipped':>8} {'failed':>8}")
+    for name in names:
+        print(
+            f"{name:<24} {counts[name, 'ok']:>8} {counts[name, 'skipped']:>8} "
+            f"{counts[name, 'error'] + counts[name, 'not violated']:>8}"
+        )
+    elapsed = time.perf_counter() - start
+    done = sum(len(pending) for _, _, pending in tasks)
+    print(f"processed {done} input/mutation pairs in {elapsed:.2f} s; manifest: {manifest_path}")
+    return 1 if any(status in ("error", "not violated") for _, status in counts) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
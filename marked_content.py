@@ -0,0 +1,61 @@
+import io
+
+import pikepdf
+
+
+def escape_string(text: bytes) -> bytes:
+    # Literal string body for a ( ) operand.
+    return text.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class MarkedContentWriter:
+    # Writes one page's content stream with MCIDs handed out in order. The
+    # struct_elems list is the page's ParentTree entry (struct_elems[mcid]
+    # owns that marked-content sequence) and can be given to
+    # ParentTreeBuilder.add_page as is. Operators go straight into a BytesIO,
+    # whose getvalue() returns its buffer without another copy.
+
+    def __init__(self) -> None:
+        self._buffer = io.BytesIO()
+        self.struct_elems: list[pikepdf.Object] = []
+
+    @property
+    def next_mcid(self) -> int:
+        return len(self.struct_elems)
+
+    def write(self, operators: bytes) -> None:
+        self._buffer.write(operators)
+
+    def begin(self, tag: str, struct_elem: pikepdf.Object) -> int:
+        mcid = len(self.struct_elems)
+        self.struct_elems.append(struct_elem)
+        self._buffer.write(b"/%s << /MCID %d >> BDC\n" % (tag.encode(), mcid))
+        return mcid
+
+    def end(self) -> None:
+        self._buffer.write(b"EMC\n")
+
+    def text_run(
+        self,
+        tag: str,
+        struct_elem: pikepdf.Object,
+        font: str,
+        size: float,
+        x: float,
+        y: float,
+        text: bytes,
+    ) -> int:
+        # BDC, one BT/ET text object showing ``text``, EMC; returns the MCID.
+        mcid = len(self.struct_elems)
+        self.struct_elems.append(struct_elem)
+        self._buffer.write(
+            b"/%s << /MCID %d >> BDC\nBT\n/%s %g Tf\n%g %g Td\n(%s) Tj\nET\nEMC\n"
+            % (tag.encode(), mcid, font.encode(), size, x, y, escape_string(text))
+        )
+        return mcid
+
+    def getvalue(self) -> bytes:
+        return self._buffer.getvalue()
+
+    def stream(self, pdf: pikepdf.Pdf) -> pikepdf.Stream:
+        return pikepdf.Stream(pdf, self.getvalue())
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import pikepdf
+
+from check_fixtures import (
+    ORACLES,
+    iter_printermark_annotations,
+    iter_struct_tree,
+    iter_type0_fonts,
+)
+from cmap import cmap_program, parse_cmap, two_byte_cid_ranges
+from incremental import write_incremental
+
+
+MUTATED_DIR = Path("output/mutated")
+MISMATCHED_REGISTRY = "MismatchedRegistry"
+# Drawn into a PrinterMark appearance after its existing content, outside
+# any /Artifact sequence.
+UNMARKED_MARK = b"\n0 0 1 rg\n0 0 1 1 re\nf\n"
+
+
+@dataclass(frozen=True)
+class Mutation:
+    rule: str
+    # Applies the violation and returns every indirect object it changed
+    # or created; raises LookupError when the document has no target.
+    apply: Callable[[pikepdf.Pdf], list[pikepdf.Object]]
+
+
+def _owner(*objects: pikepdf.Object) -> pikepdf.Object:
+    # The innermost indirect object among ``objects`` (innermost first):
+    # the one whose serialization carries an edit to a direct child.
+    for obj in objects:
+        if obj.is_indirect:
+            return obj
+    raise ValueError("no indirect object owns the edit")
+
+
+def drop_oc_config_name(pdf: pikepdf.Pdf) -> list[pikepdf.Object]:
+    ocproperties = pdf.Root.get("/OCProperties")
+    if ocproperties is None:
+        raise LookupError("document has no /OCProperties")
+    configs = [ocproperties.D] if "/D" in ocproperties else []
+    configs.extend(ocproperties.get("/Configs", pikepdf.Array()))
+    for config in configs:
+        if "/Name" in config:
+            del config.Name
+            return [_owner(config, ocproperties, pdf.Root)]
+    raise LookupError("no optional content configuration has a /Name to drop")
+
+
+def _notes(pdf: pikepdf.Pdf) -> list[pikepdf.Dictionary]:
+    return [node for node in iter_struct_tree(pdf) if node.get("/S") == pikepdf.Name("/Note")]
+
+
+def duplicate_note_id(pdf: pikepdf.Pdf) -> list[pikepdf.Object]:
+    notes = _notes(pdf)
+    if len(notes) < 2:
+        raise LookupError("duplicating a Note ID needs at least two Note elements")
+    first, second = notes[:2]
+    note_id = first.get("/ID", pikepdf.String("note-1"))
+    first.ID = note_id
+    second.ID = note_id
+    return [first, second]
+
+
+def drop_note_id(pdf: pikepdf.Pdf) -> list[pikepdf.Object]:
+    for note in _notes(pdf):
+        if "/ID" in note:
+            del note.ID
+            return [note]
+    raise LookupError("no Note element has an /ID to drop")
+
+
+def add_role_map_cycle(pdf: pikepdf.Pdf) -> list[pikepdf.Object]:
+    # Closes a cycle through the RoleMap's first entry, or adds the
+    # generator's /H1 -> /Div, /Div -> /H1 pair to an empty one.
+    struct_tree_root = pdf.Root.get("/StructTreeRoot")
+    if struct_tree_root is None:
+        raise LookupError("document has no /StructTreeRoot")
+    if "/RoleMap" not in struct_tree_root:
+        struct_tree_root.RoleMap = pikepdf.Dictionary()
+    role_map = struct_tree_root.RoleMap
+    key, value = next(iter(role_map.items()), ("/H1", pikepdf.Name("/Div")))
+    role_map[key] = value
+    role_map[str(value)] = pikepdf.Name(key)
+    return [_owner(role_map, struct_tree_root, pdf.Root)]
+
+
+def _number_tree_nodes(node: pikepdf.Dictionary) -> list[pikepdf.Object]:
+    nodes = [node]
+    for kid in node.get("/Kids", pikepdf.Array()):
+        nodes.extend(_number_tree_nodes(kid))
+    return [node for node in nodes if node.is_indirect]
+
+
+def add_printermark_to_structure(pdf: pikepdf.Pdf) -> list[pikepdf.Object]:
+    # Appends an OBJR for a PrinterMark annotation to the first structure
+    # element, registering it in the ParentTree as a tagged annotation
+    # would be.
+    struct_tree_root = pdf.Root.get("/StructTreeRoot")
+    if struct_tree_root is None:
+        raise LookupError("document has no /StructTreeRoot")
+    annotation = next(
+        (
+            annotation
+            for annotation in iter_printermark_annotations(pdf)
+            if annotation.is_indirect and "/StructParent" not in annotation
+        ),
+        None,
+    )
+    if annotation is None:
+        raise LookupError("no untagged PrinterMark annotation")
+    struct_elem = next(
+        (node for node in iter_struct_tree(pdf) if node.is_indirect and "/S" in node),
+        None,
+    )
+    if struct_elem is None:
+        raise LookupError("the structure tree has no indirect structure element")
+
+    page = next(page for page in pdf.pages if annotation in page.obj.get("/Annots", ()))
+    objr = pdf.make_indirect(
+        pikepdf.Dictionary(Type=pikepdf.Name("/OBJR"), Obj=annotation, Pg=page.obj)
+    )
+    kids = struct_elem.get("/K")
+    if kids is None:
+        struct_elem.K = [objr]
+    elif isinstance(kids, pikepdf.Array):
+        kids.append(objr)
+    else:
+        struct_elem.K = [kids, objr]
+
+    if "/ParentTree" not in struct_tree_root:
+        struct_tree_root.ParentTree = pikepdf.Dictionary(Nums=[])
+    if not struct_tree_root.ParentTree.is_indirect:
+        struct_tree_root.ParentTree = pdf.make_indirect(struct_tree_root.ParentTree)
+    parent_tree = pikepdf.NumberTree(struct_tree_root.ParentTree)
+    key = max(
+        int(struct_tree_root.get("/ParentTreeNextKey", 0)),
+        max(parent_tree.keys(), default=-1) + 1,
+    )
+    parent_tree[key] = struct_elem
+    annotation.StructParent = key
+    struct_tree_root.ParentTreeNextKey = key + 1
+    return [
+        objr,
+        struct_elem,
+        annotation,
+        _owner(struct_tree_root, pdf.Root),
+        *_number_tree_nodes(struct_tree_root.ParentTree),
+    ]
+
+
+def draw_printermark_outside_artifact(pdf: pikepdf.Pdf) -> list[pikepdf.Object]:
+    for annotation in iter_printermark_annotations(pdf):
+        appearance = annotation.get("/AP", pikepdf.Dictionary()).get("/N")
+        if isinstance(appearance, pikepdf.Stream):
+            appearance.write(appearance.read_bytes() + UNMARKED_MARK)
+            return [appearance]
+    raise LookupError("no PrinterMark annotation with a normal appearance stream")
+
+
+def mismatch_cidsysteminfo_registry(pdf: pikepdf.Pdf) -> list[pikepdf.Object]:
+    # Gives the Type0 font a CIDSystemInfo that matches its CIDFont's
+    # except for /Registry, as the 7.21.3-1 generator does.
+    for font in iter_type0_fonts(pdf):
+        cid_info = font.DescendantFonts[0].get("/CIDSystemInfo")
+        if cid_info is None:
+            continue
+        registry = MISMATCHED_REGISTRY
+        if str(cid_info.get("/Registry", "")) == registry:
+            registry = "Adobe"
+        font.CIDSystemInfo = pikepdf.Dictionary(
+            Registry=pikepdf.String(registry),
+            Ordering=cid_info.get("/Ordering", pikepdf.String("Identity")),
+            Supplement=cid_info.get("/Supplement", 0),
+        )
+        return [_owner(font, pdf.Root)]
+    raise LookupError("no Type0 font with a CIDSystemInfo")
+
+
+def identity_cmap_stream(pdf: pikepdf.Pdf, name: str, wmode: int) -> pikepdf.Stream:
+    # An embedded equivalent of the predefined Identity-H/-V CMaps. A
+    # cidrange's bounds may differ only in their last byte, so the mapping
+    # is one <XX00> <XXFF> row per lead byte.
+    return pdf.make_stream(
+        cmap_program(
+            name,
+            wmode=wmode,
+            cid_system_info=("Adobe", "Identity", 0),
+            codespace_ranges=[(b"\x00\x00", b"\xff\xff")],
+            cid_ranges=two_byte_cid_ranges(
+                256, first_cid=0, lead_bytes=range(256), trail_bytes=range(256)
+            ),
+        ),
+        Type=pikepdf.Name("/CMap"),
+        CMapName=pikepdf.Name(f"/{name}"),
+        CIDSystemInfo=pikepdf.Dictionary(
+            Registry=pikepdf.String("Adobe"),
+            Ordering=pikepdf.String("Identity"),
+            Supplement=0,
+        ),
+    )
+
+
+def flip_cmap_wmode(pdf: pikepdf.Pdf) -> list[pikepdf.Object]:
+    # Makes the Encoding CMap's dictionary /WMode disagree with the WMode
+    # its program defines. A predefined Identity-H/-V encoding is first
+    # embedded, so the text still decodes to the same CIDs.
+    for font in iter_type0_fonts(pdf):
+        encoding = font.get("/Encoding")
+        if isinstance(encoding, pikepdf.Stream):
+            wmode = parse_cmap(encoding.read_bytes()).wmode
+            encoding.WMode = 1 - wmode
+            return [encoding]
+        if encoding in (pikepdf.Name("/Identity-H"), pikepdf.Name("/Identity-V")):
+            wmode = int(encoding == pikepdf.Name("/Identity-V"))
+            encoding = identity_cmap_stream(pdf, str(encoding)[1:], wmode)
+            encoding.WMode = 1 - wmode
+            font.Encoding = encoding
+            return [encoding, _owner(font, pdf.Root)]
+    raise LookupError("no Type0 font with an embedded or Identity CMap")
+
+
+MUTATIONS = {
+    "oc-config-name": Mutation("7.10-1", drop_oc_config_name),
+    "note-id-duplicate": Mutation("7.9-2", duplicate_note_id),
+    "note-id-missing": Mutation("7.9-2", drop_note_id),
+    "role-map-cycle": Mutation("7.1-3", add_role_map_cycle),
+    "printermark-in-structure": Mutation("7.18.8-1", add_printermark_to_structure),
+    "printermark-appearance": Mutation("7.18.8-2", draw_printermark_outside_artifact),
+    "cidsysteminfo-registry": Mutation("7.21.3-1", mismatch_cidsysteminfo_registry),
+    "cmap-wmode": Mutation("7.21.3.3-1", flip_cmap_wmode),
+}
+
+
+def mutated_path(input_path: Path, name: str, output_dir: Path = MUTATED_DIR) -> Path:
+    # Named like the generated fixtures, so check_fixtures picks it up.
+    rule = MUTATIONS[name].rule
+    return output_dir / f"mh_ua1-{rule}_fail__{input_path.stem}_{name}.pdf"
+
+
+def violates(path: Path, name: str) -> bool:
+    with pikepdf.open(path) as pdf:
+        return ORACLES[MUTATIONS[name].rule](pdf)
+
+
+def mutate(input_path: Path, output_path: Path, name: str, rewrite: bool = False) -> None:
+    # By default the violation is appended to the untouched input as an
+    # incremental update holding only the changed objects. ``rewrite``
+    # saves the whole document instead.
+    mutation = MUTATIONS[name]
+    if not rewrite:
+        write_incremental(input_path, output_path, mutation.apply, diff=False)
+        return
+    from save_profiles import save_pdf
+
+    with pikepdf.open(input_path) as pdf:
+        mutation.apply(pdf)
+        save_pdf(pdf, output_path, deterministic_id=True)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Turn an existing PDF/UA document into a fail fixture for one rule.",
+    )
+    parser.add_argument("input", nargs="?", type=Path, help="valid PDF/UA document")
+    parser.add_argument(
+        "output",
+        nargs="?",
+        type=Path,
+        help=f"where to write the fail fixture (default: under {MUTATED_DIR}/)",
+    )
+    parser.add_argument("-m", "--mutation", choices=sorted(MUTATIONS), help="violation to apply")
+    parser.add_argument(
+        "--rewrite",
+        action="store_true",
+        help="save the whole document instead of appending an incremental update",
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        dest="list_only",
+        action="store_true",
+        help="list the available mutations",
+    )
+    args = parser.parse_args(argv)
+    if not args.list_only and (args.input is None or args.mutation is None):
+        parser.error("an input document and --mutation are required")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.list_only:
+        for name, mutation in sorted(MUTATIONS.items()):
+            print(f"{mutation.rule:<12} {name}")
+        return 0
+
+    output_path = args.output or mutated_path(args.input, args.mutation)
+    try:
+        mutate(args.input, output_path, args.mutation, args.rewrite)
+    except LookupError as exc:
+        print(f"{args.input}: {exc}", file=sys.stderr)
+        return 1
+    rule = MUTATIONS[args.mutation].rule
+    violated = violates(output_path, args.mutation)
+    print(f"{'violates' if violated else 'DOES NOT violate'} {rule}: {output_path}")
+    return 0 if violated else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import pikepdf
+
+from marked_content import MarkedContentWriter
+from telemetry import instrumented
+
+
+PAGE_SIZE = (612, 792)
+OCGS_PER_PAGE = 500
+# Where a nameless configuration goes: the default D, or the first, middle
+# or last of the alternate Configs.
+UNNAMED_POSITIONS = ("default", "first", "middle", "last")
+
+
+def unnamed_config_indices(config_count: int, unnamed_at: list[str]) -> set[int]:
+    # Index -1 is D; 0..config_count-1 are the alternate Configs.
+    indices = set()
+    for position in unnamed_at:
+        if position == "default":
+            indices.add(-1)
+        elif position == "first":
+            indices.add(0)
+        elif position == "middle":
+            indices.add(config_count // 2)
+        elif position == "last":
+            indices.add(config_count - 1)
+        else:
+            raise ValueError(f"unknown unnamed config position {position!r}")
+    return indices
+
+
+def build_oc_page_content(pdf: pikepdf.Pdf, first_ocg: int, count: int) -> pikepdf.Stream:
+    # One artifact rectangle per OCG, each inside /OC marked content naming
+    # the OCG through the page's Properties resource.
+    columns = 25
+    width = PAGE_SIZE[0] / columns
+    height = PAGE_SIZE[1] / -(-count // columns)
+    content = MarkedContentWriter()
+    for offset in range(count):
+        row, column = divmod(offset, columns)
+        content.write(
+            b"/Artifact BMC\n/OC /oc%d BDC\n%.2f %.2f %.2f %.2f re\nf\nEMC\nEMC\n"
+            % (first_ocg + offset, column * width, row * height, width - 1, height - 1)
+        )
+    return content.stream(pdf)
+
+
+def build_scaled_ocproperties(
+    pdf: pikepdf.Pdf,
+    ocg_count: int,
+    config_count: int,
+    unnamed_at: list[str],
+    ocgs_per_page: int = OCGS_PER_PAGE,
+) -> pikepdf.Dictionary:
+    # ocg_count OCGs used from /OC marked content across as many pages as
+    # needed, a default D and config_count alternate Configs. Every
+    # configuration's Order is the one indirect array that OCProperties'
+    # OCGs also points at, so the OCG references are written once; each
+    # alternate switches a different OCG off, so no two are identical.
+    if ocg_count < 1 or config_count < 1:
+        raise ValueError("ocg_count and config_count must be positive")
+    unnamed = unnamed_config_indices(config_count, unnamed_at)
+
+    ocg_type = pikepdf.Name("/OCG")
+    ocgs = pdf.make_indirect(
+        pikepdf.Array(
+            [
+                pdf.make_indirect(
+                    pikepdf.Dictionary(Type=ocg_type, Name=pikepdf.String(f"Layer {n + 1}"))
+                )
+                for n in range(ocg_count)
+            ]
+        )
+    )
+
+    for first_ocg in range(0, ocg_count, ocgs_per_page):
+        count = min(ocgs_per_page, ocg_count - first_ocg)
+        page = pdf.add_blank_page(page_size=PAGE_SIZE)
+        page.Resources = pikepdf.Dictionary(
+            Properties=pikepdf.Dictionary(
+                {f"/oc{n}": ocgs[n] for n in range(first_ocg, first_ocg + count)}
+            )
+        )
+        page.Contents = build_oc_page_content(pdf, first_ocg, count)
+
+    config_type = pikepdf.Name("/OCConfig")
+    base_state = pikepdf.Name("/ON")
+
+    def build_config(index: int) -> pikepdf.Dictionary:
+        config = pikepdf.Dictionary(Type=config_type, BaseState=base_state, Order=ocgs)
+        if index >= 0:
+            config.OFF = [ocgs[index % ocg_count]]
+        if index not in unnamed:
+            config.Name = pikepdf.String(f"OCConfig-{index + 2}")
+        return pdf.make_indirect(config)
+
+    return pikepdf.Dictionary(
+        OCGs=ocgs,
+        Configs=[build_config(index) for index in range(config_count)],
+        D=build_config(-1),
+    )
+
+
+@instrumented("structure")
+def build_scaled_pdf(
+    ocg_count: int,
+    config_count: int,
+    unnamed_at: list[str],
+    ocgs_per_page: int = OCGS_PER_PAGE,
+) -> pikepdf.Pdf:
+    # A new document holding the scaled optional content and its pages;
+    # the caller adds its own metadata.
+    pdf = pikepdf.Pdf.new()
+    pdf.Root.OCProperties = build_scaled_ocproperties(
+        pdf, ocg_count, config_count, unnamed_at, ocgs_per_page
+    )
+    return pdf
@@ -0,0 +1,188 @@
+import errno
+import fcntl
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import zipfile
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+
+BLOB_DIR = Path("output/.blobs")
+LINK_MODES = ("hardlink", "reflink")
+ARCHIVE_FORMATS = ("tar", "tar.zst", "zip")
+# Fixed member metadata, so the same corpus always archives to the same bytes.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# linux/fs.h FICLONE: share the source file's extents (btrfs, XFS, ...).
+FICLONE = 0x40049409
+
+_backend: Callable[[Path, bytes], None] | None = None
+
+
+def has_backend() -> bool:
+    return _backend is not None
+
+
+@contextmanager
+def active_backend(backend: Callable[[Path, bytes], None] | None) -> Iterator[None]:
+    global _backend
+    previous, _backend = _backend, backend
+    try:
+        yield
+    finally:
+        _backend = previous
+
+
+def write_output(path: Path, data: bytes) -> None:
+    if _backend is not None:
+        _backend(path, data)
+        return
+    # Replacing rather than writing through, so a path that is a link to a
+    # blob (from an earlier --dedup build) never changes the blob.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+def _reflink(source: Path, target: Path) -> None:
+    with source.open("rb") as source_handle, target.open("wb") as target_handle:
+        fcntl.ioctl(target_handle.fileno(), FICLONE, source_handle.fileno())
+
+
+class BlobStore:
+    # Content-addressed store: every distinct output is written once under
+    # its sha256, and requested paths become links to it.
+
+    def __init__(self, root: Path = BLOB_DIR, link: str = "hardlink") -> None:
+        if link not in LINK_MODES:
+            raise ValueError(f"unknown link mode {link!r}")
+        self.root = root
+        self.link = link
+        self.index_path = root / "index.jsonl"
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def __call__(self, path: Path, data: bytes) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self.blob_path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            temporary = blob.with_name(f"{digest}.{os.getpid()}.tmp")
+            temporary.write_bytes(data)
+            os.replace(temporary, blob)
+        self.materialize(blob, path)
+        with self.index_path.open("a") as handle:
+            handle.write(
+                json.dumps({"path": str(path), "digest": digest, "size": len(data)}) + "\n"
+            )
+
+    def materialize(self, blob: Path, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.link == "hardlink" and path.exists() and path.samefile(blob):
+            return
+        # Links are made beside the target and renamed over it, so an
+        # existing file is replaced atomically and never written through
+        # (which would change the blob every hardlink shares).
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temporary.unlink(missing_ok=True)
+        try:
+            if self.link == "reflink":
+                _reflink(blob, temporary)
+            else:
+                os.link(blob, temporary)
+        except OSError as exc:
+            if exc.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM):
+                raise
+            shutil.copyfile(blob, temporary)
+        os.replace(temporary, path)
+
+    def report(self) -> tuple[int, int, int]:
+        # (outputs, bytes requested, bytes stored) over each path's latest
+        # write in the index.
+        latest = {}
+        if self.index_path.exists():
+            with self.index_path.open() as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    latest[entry["path"]] = entry
+        requested = sum(entry["size"] for entry in latest.values())
+        stored = sum({entry["digest"]: entry["size"] for entry in latest.values()}.values())
+        return len(latest), requested, stored
+
+
+def archive_format_for(path: Path) -> str:
+    if path.name.endswith((".tar.zst", ".tzst")):
+        return "tar.zst"
+    if path.suffix == ".zip":
+        return "zip"
+    return "tar"
+
+
+class ArchiveWriter:
+    # Streams outputs into one tar or zip written strictly sequentially, so
+    # the target may be a pipe. The index gives each member's data offset:
+    # a file offset for tar and zip, an offset into the decompressed tar
+    # stream for tar.zst.
+
+    def __init__(self, stream: BinaryIO, archive_format: str = "tar") -> None:
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"unknown archive format {archive_format!r}")
+        self.index: dict[str, dict] = {}
+        self._compressor = None
+        self._tar = None
+        self._zip = None
+        if archive_format == "tar.zst":
+            try:
+                import zstandard
+            except ImportError as exc:
+                raise RuntimeError("tar.zst output needs the optional 'zstandard' package") from exc
+            self._compressor = zstandard.ZstdCompressor().stream_writer(stream, closefd=False)
+            stream = self._compressor
+        if archive_format == "zip":
+            self._zip = zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_STORED)
+        else:
+            self._tar = tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT)
+
+    def add(self, path: Path, data: bytes) -> None:
+        name = path.as_posix().lstrip("/")
+        if self._tar is not None:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(data))
+            padded = -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            offset = self._tar.offset - padded
+        else:
+            info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+            info.external_attr = 0o644 << 16
+            self._zip.writestr(info, data)
+            # Fixed local file header (30 bytes), then name and extra field.
+            offset = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+        self.index[name] = {
+            "name": name,
+            "offset": offset,
+            "size": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+
+    def close(self) -> None:
+        if self._tar is not None:
+            self._tar.close()
+        else:
+            self._zip.close()
+        if self._compressor is not None:
+            self._compressor.close()
+
+    def write_index(self, index_path: Path) -> None:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index_path.write_text(json.dumps(list(self.index.values()), indent=1) + "\n")
@@ -0,0 +1,84 @@
+import math
+from collections.abc import Iterator
+from itertools import chain
+
+import pikepdf
+
+
+# Entries per leaf and kids per intermediate node.
+DEFAULT_FAN_OUT = 32
+
+
+def _chunks(items: list, fan_out: int) -> Iterator[list]:
+    # Splits ``items`` into as few chunks of at most ``fan_out`` as possible,
+    # with sizes differing by at most one, so every node is about as full.
+    count = max(1, math.ceil(len(items) / fan_out))
+    size, extra = divmod(len(items), count)
+    start = 0
+    for index in range(count):
+        stop = start + size + (index < extra)
+        yield items[start:stop]
+        start = stop
+
+
+class ParentTreeBuilder:
+    # Collects ParentTree entries as pages and annotations are tagged, with
+    # keys handed out in increasing order, then emits them as a balanced
+    # number tree. A tree that fits one node stays a flat /Nums array.
+
+    def __init__(self, fan_out: int = DEFAULT_FAN_OUT, first_key: int = 0) -> None:
+        if fan_out < 2:
+            raise ValueError("fan_out must be at least 2")
+        self.fan_out = fan_out
+        self.next_key = first_key
+        # (key, value): a page's list of structure elements indexed by
+        # MCID, or an annotation's structure element.
+        self._entries: list[tuple[int, object]] = []
+        self._pages: dict[int, list] = {}
+
+    def _add(self, value: object) -> int:
+        key = self.next_key
+        self.next_key += 1
+        self._entries.append((key, value))
+        return key
+
+    def add_page(self, page: pikepdf.Page, elements: list | None = None) -> int:
+        # ``elements`` may already hold the page's structure elements by
+        # MCID, as MarkedContentWriter.struct_elems does.
+        elements = [] if elements is None else elements
+        key = self._add(elements)
+        self._pages[key] = elements
+        page.StructParents = key
+        return key
+
+    def add_marked_content(self, page_key: int, struct_elem: pikepdf.Object) -> int:
+        # Returns the MCID the page's next marked-content sequence must use.
+        elements = self._pages[page_key]
+        elements.append(struct_elem)
+        return len(elements) - 1
+
+    def add_object(self, obj: pikepdf.Object, struct_elem: pikepdf.Object) -> int:
+        key = self._add(struct_elem)
+        obj.StructParent = key
+        return key
+
+    def build(self, pdf: pikepdf.Pdf) -> pikepdf.Dictionary:
+        # One pass over the entries for the leaves, then one per level over
+        # a fan_out-th as many nodes as the level below.
+        chunks = list(_chunks(self._entries, self.fan_out))
+        if len(chunks) == 1:
+            return pdf.make_indirect(pikepdf.Dictionary(Nums=list(chain.from_iterable(chunks[0]))))
+
+        level = []
+        for chunk in chunks:
+            limits = [chunk[0][0], chunk[-1][0]]
+            leaf = pikepdf.Dictionary(Nums=list(chain.from_iterable(chunk)), Limits=limits)
+            level.append((limits, pdf.make_indirect(leaf)))
+        while len(level) > self.fan_out:
+            parents = []
+            for chunk in _chunks(level, self.fan_out):
+                limits = [chunk[0][0][0], chunk[-1][0][1]]
+                kids = pikepdf.Dictionary(Kids=[node for _, node in chunk], Limits=limits)
+                parents.append((limits, pdf.make_indirect(kids)))
+            level = parents
+        return pdf.make_indirect(pikepdf.Dictionary(Kids=[node for _, node in level]))
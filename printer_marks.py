@@ -0,0 +1,108 @@
+import hashlib
+import math
+
+import pikepdf
+
+
+PAGE_SIZE = (612, 792)
+APPEARANCE_BBOX = (0, 0, 100, 100)
+# Gap between neighbouring annotation rectangles, in points.
+MARK_MARGIN = 2
+
+
+class AppearanceCache:
+    # One indirect Form XObject per distinct appearance, keyed by a hash of
+    # its content and bounding box, so any number of annotations can share
+    # a small pool of streams.
+
+    def __init__(self, pdf: pikepdf.Pdf) -> None:
+        self.pdf = pdf
+        self._streams: dict[tuple, pikepdf.Stream] = {}
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def get(self, content: bytes, bbox: tuple = APPEARANCE_BBOX) -> pikepdf.Stream:
+        key = (hashlib.sha256(content).digest(), tuple(bbox))
+        if key not in self._streams:
+            self._streams[key] = self.pdf.make_indirect(
+                pikepdf.Stream(
+                    self.pdf,
+                    content,
+                    Type=pikepdf.Name("/XObject"),
+                    Subtype=pikepdf.Name("/Form"),
+                    BBox=list(bbox),
+                    Resources=pikepdf.Dictionary(),
+                )
+            )
+        return self._streams[key]
+
+
+def pool_content(index: int, pool_size: int, artifact_wrapped: bool) -> bytes:
+    # The pool's appearances differ only in their fill colour.
+    shade = (index % pool_size + 1) / pool_size
+    content = b"0 0 %.3f rg\n10 10 60 40 re\nf\n" % shade
+    if artifact_wrapped:
+        return b"/Artifact BMC\n" + content + b"EMC\n"
+    return content
+
+
+def mark_rects(count: int) -> list[list[float]]:
+    # A near-square grid of rectangles covering the page.
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    width = PAGE_SIZE[0] / columns
+    height = PAGE_SIZE[1] / rows
+    return [
+        [
+            round(column * width + MARK_MARGIN, 2),
+            round(row * height + MARK_MARGIN, 2),
+            round((column + 1) * width - MARK_MARGIN, 2),
+            round((row + 1) * height - MARK_MARGIN, 2),
+        ]
+        for index in range(count)
+        for row, column in [divmod(index, columns)]
+    ]
+
+
+def add_printermark_pages(
+    pdf: pikepdf.Pdf,
+    page_count: int,
+    marks_per_page: int,
+    pool_size: int,
+    artifact_wrapped: bool,
+) -> list[tuple[pikepdf.Page, list[pikepdf.Dictionary]]]:
+    # Adds page_count pages, each with marks_per_page PrinterMark
+    # annotations whose appearances come from a pool of pool_size shared
+    # streams, and returns every page with its annotations. Tagged callers
+    # set /Tabs when they build the structure.
+    if page_count < 1 or marks_per_page < 1 or pool_size < 1:
+        raise ValueError("page_count, marks_per_page and pool_size must be positive")
+    appearances = AppearanceCache(pdf)
+    rects = mark_rects(marks_per_page)
+    annotation_type = pikepdf.Name("/Annot")
+    printermark_type = pikepdf.Name("/PrinterMark")
+    pages = []
+    for page_index in range(page_count):
+        page = pdf.add_blank_page(page_size=PAGE_SIZE)
+        if "/Contents" in page:
+            del page["/Contents"]
+        annotations = []
+        for mark_index, rect in enumerate(rects):
+            appearance = appearances.get(
+                pool_content(page_index * marks_per_page + mark_index, pool_size, artifact_wrapped)
+            )
+            annotations.append(
+                pdf.make_indirect(
+                    pikepdf.Dictionary(
+                        Type=annotation_type,
+                        Subtype=printermark_type,
+                        Rect=rect,
+                        P=page.obj,
+                        AP=pikepdf.Dictionary(N=appearance),
+                    )
+                )
+            )
+        page.Annots = annotations
+        pages.append((page, annotations))
+    return pages
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+import argparse
+import ast
+import fnmatch
+import importlib
+import importlib.util
+import inspect
+import operator
+import os
+import re
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from dataclasses import dataclass, field, replace
+from functools import partial
+from pathlib import Path
+
+import build_cache
+from output_store import (
+    ARCHIVE_FORMATS,
+    ArchiveWriter,
+    BlobStore,
+    active_backend,
+    archive_format_for,
+)
+
+
+ROOT_DIR = Path(__file__).resolve().parent
+GENERATOR_GLOB = "generate_mh_ua1_*.py"
+FIXTURE_NAME_RE = re.compile(r"^mh_ua1-(?P<rule>[0-9.]+-[0-9]+)_(?P<variant>pass|fail)")
+# Path joins plus the integer arithmetic fixture tables use for sizes.
+BINARY_OPERATORS = {
+    ast.Div: operator.truediv,
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.FloorDiv: operator.floordiv,
+}
+# The keys of save_profiles.SAVE_PROFILES, repeated here so listing and
+# argument parsing do not import pikepdf.
+SAVE_PROFILE_NAMES = ("compact", "classic", "linearized")
+PROFILES_DIR = Path("output/profiles")
+
+
+@dataclass(frozen=True)
+class Fixture:
+    module: str
+    rule: str
+    variant: str
+    output_path: Path
+    params: dict = field(default_factory=dict, hash=False)
+    # Set when the fixture is written as an incremental update of the pass
+    # document at this path instead of being built from scratch.
+    update_of: Path | None = None
+    delta_only: bool = False
+    profile: str | None = None
+
+
+def _evaluate(node: ast.expr, env: dict) -> object:
+    # Just enough of Python to read the FIXTURES tables without importing
+    # the generator (and therefore pikepdf).
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id not in env:
+            raise ValueError(f"unresolved name {node.id!r}")
+        return env[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        operator_function = BINARY_OPERATORS[type(node.op)]
+        return operator_function(_evaluate(node.left, env), _evaluate(node.right, env))
+    if isinstance(node, ast.JoinedStr):
+        return "".join(str(_evaluate(value, env)) for value in node.values)
+    if isinstance(node, ast.FormattedValue) and node.conversion == -1:
+        spec = "" if node.format_spec is None else _evaluate(node.format_spec, env)
+        return format(_evaluate(node.value, env), spec)
+    if isinstance(node, ast.ListComp):
+        return _evaluate_comprehension(node.elt, node.generators, env)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_evaluate(node.operand, env)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "Path":
+        return Path(*(_evaluate(arg, env) for arg in node.args))
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_evaluate(elt, env) for elt in node.elts]
+    if isinstance(node, ast.Dict):
+        return {
+            _evaluate(key, env): _evaluate(value, env)
+            for key, value in zip(node.keys, node.values)
+        }
+    raise ValueError(f"unsupported expression {ast.dump(node)}")
+
+
+def _evaluate_comprehension(
+    element: ast.expr,
+    generators: list[ast.comprehension],
+    env: dict,
+) -> list:
+    if not generators:
+        return [_evaluate(element, env)]
+    generator, rest = generators[0], generators[1:]
+    if generator.ifs or not isinstance(generator.target, ast.Name):
+        raise ValueError("only plain 'for name in iterable' comprehensions are supported")
+    results = []
+    for value in _evaluate(generator.iter, env):
+        results.extend(
+            _evaluate_comprehension(element, rest, {**env, generator.target.id: value})
+        )
+    return results
+
+
+def read_fixture_table(source_path: Path, table: str = "FIXTURES") -> list:
+    tree = ast.parse(source_path.read_text(), filename=str(source_path))
+    env: dict = {}
+    for statement in tree.body:
+        if not isinstance(statement, ast.Assign) or len(statement.targets) != 1:
+            continue
+        target = statement.targets[0]
+        if not isinstance(target, ast.Name) or not target.id.isupper():
+            continue
+        try:
+            env[target.id] = _evaluate(statement.value, env)
+        except ValueError:
+            continue
+    if table not in env:
+        if table == "FIXTURES":
+            raise ValueError(f"{source_path.name} does not declare a FIXTURES table")
+        return []
+    return env[table]
+
+
+def discover_fixtures(root_dir: Path = ROOT_DIR, stress: bool = False) -> list[Fixture]:
+    # STRESS_FIXTURES hold the large parameterizations (hundreds of thousands
+    # of objects) that are only built on request.
+    tables = ("FIXTURES", "STRESS_FIXTURES") if stress else ("FIXTURES",)
+    fixtures = []
+    for source_path in sorted(root_dir.glob(GENERATOR_GLOB)):
+        entries = [entry for table in tables for entry in read_fixture_table(source_path, table)]
+        for output_path, params in entries:
+            match = FIXTURE_NAME_RE.match(Path(output_path).name)
+            if match is None:
+                raise ValueError(
+                    f"{source_path.name}: cannot derive rule ID from {output_path}"
+                )
+            fixtures.append(
+                Fixture(
+                    module=source_path.stem,
+                    rule=match["rule"],
+                    variant=match["variant"],
+                    output_path=Path(output_path),
+                    params=params,
+                )
+            )
+    return fixtures
+
+
+def select_fixtures(fixtures: list[Fixture], patterns: list[str]) -> list[Fixture]:
+    if not patterns:
+        return fixtures
+    return [
+        fixture
+        for fixture in fixtures
+        if any(fnmatch.fnmatchcase(fixture.rule, pattern) for pattern in patterns)
+    ]
+
+
+def profile_path(output_path: Path, profile: str) -> Path:
+    # Matrix builds keep each profile's corpus in its own tree, with the
+    # fixture names (and so the rule IDs they carry) unchanged.
+    parts = output_path.parts
+    relative = Path(*parts[1:]) if parts and parts[0] == "output" else output_path
+    return PROFILES_DIR / profile / relative
+
+
+def with_profiles(fixtures: list[Fixture], profile: str) -> list[Fixture]:
+    if profile != "matrix":
+        return [replace(fixture, profile=profile) for fixture in fixtures]
+    return [
+        replace(fixture, output_path=profile_path(fixture.output_path, name), profile=name)
+        for name in SAVE_PROFILE_NAMES
+        for fixture in fixtures
+    ]
+
+
+def _is_variant_delta(fixture: Fixture) -> bool:
+    # Only fixtures whose parameters are exactly apply_variant()'s can be
+    # derived from the pass document; stress parameterizations are not.
+    apply_variant = getattr(importlib.import_module(fixture.module), "apply_variant", None)
+    if apply_variant is None:
+        return False
+    try:
+        inspect.signature(apply_variant).bind(None, **fixture.params)
+    except TypeError:
+        return False
+    return True
+
+
+def companion_outputs(fixture: Fixture) -> list[Path]:
+    # Files a generator's build_pdf writes besides the fixture, from its
+    # optional companion_outputs(output_path, **params).
+    if fixture.update_of is not None:
+        return []
+    hook = getattr(importlib.import_module(fixture.module), "companion_outputs", None)
+    return [] if hook is None else hook(fixture.output_path, **fixture.params)
+
+
+def as_incremental_updates(fixtures: list[Fixture], delta_only: bool) -> list[Fixture]:
+    pass_paths = {
+        (fixture.module, fixture.profile): fixture.output_path
+        for fixture in fixtures
+        if fixture.variant == "pass" and _is_variant_delta(fixture)
+    }
+    updated = []
+    for fixture in fixtures:
+        if (
+            fixture.variant != "fail"
+            or (fixture.module, fixture.profile) not in pass_paths
+            or not _is_variant_delta(fixture)
+        ):
+            updated.append(fixture)
+            continue
+        output_path = fixture.output_path
+        if delta_only:
+            output_path = output_path.with_name(output_path.name + ".delta")
+        updated.append(
+            replace(
+                fixture,
+                output_path=output_path,
+                update_of=pass_paths[fixture.module, fixture.profile],
+                delta_only=delta_only,
+            )
+        )
+    return updated
+
+
+def build_fixture(fixture: Fixture, dedup: str | None = None) -> float:
+    from save_profiles import active_profile
+    from telemetry import labels, phase
+
+    module = importlib.import_module(fixture.module)
+    start = time.perf_counter()
+    with (
+        labels(fixture=str(fixture.output_path)),
+        phase("fixture", rule=fixture.rule),
+        active_profile(fixture.profile),
+        active_backend(BlobStore(link=dedup)) if dedup else nullcontext(),
+    ):
+        if fixture.update_of is None:
+            module.build_pdf(fixture.output_path, **fixture.params)
+        else:
+            from incremental import write_incremental
+
+            write_incremental(
+                fixture.update_of,
+                fixture.output_path,
+                partial(module.apply_variant, **fixture.params),
+                fixture.delta_only,
+            )
+    return time.perf_counter() - start
+
+
+def render_fixture(fixture: Fixture, dedup: str | None = None) -> tuple[float, list]:
+    # Builds the fixture without touching the filesystem and hands back
+    # every output it produced as (path, bytes).
+    outputs = []
+    with active_backend(lambda path, data: outputs.append((path, data))):
+        elapsed = build_fixture(fixture)
+    return elapsed, outputs
+
+
+def run_fixtures(
+    fixtures: list[Fixture],
+    jobs: int,
+    on_success: Callable[[Fixture, float], None] | None = None,
+    dedup: str | None = None,
+    archive: ArchiveWriter | None = None,
+) -> list[tuple[Fixture, BaseException]]:
+    # Import every generator up front so pikepdf is loaded once and forked
+    # workers inherit it instead of paying the cold start per process.
+    for module in sorted({fixture.module for fixture in fixtures}):
+        importlib.import_module(module)
+
+    failures = []
+    worker = build_fixture if archive is None else render_fixture
+
+    def finish(fixture: Fixture, result: float | tuple[float, list]) -> None:
+        if archive is None:
+            elapsed = result
+        else:
+            elapsed, outputs = result
+            for path, data in outputs:
+                archive.add(path, data)
+        print(f"{elapsed * 1000:8.1f} ms  {fixture.output_path}")
+        if on_success is not None:
+            on_success(fixture, elapsed)
+
+    if jobs <= 1:
+        for fixture in fixtures:
+            try:
+                result = worker(fixture, dedup)
+            except Exception as exc:
+                failures.append((fixture, exc))
+                print(f"FAILED {fixture.output_path}: {exc}", file=sys.stderr)
+            else:
+                finish(fixture, result)
+        return failures
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(worker, fixture, dedup): fixture for fixture in fixtures}
+        # Archive members are written in fixture order, so the same corpus
+        # always produces the same archive.
+        completed = futures if archive is not None else as_completed(futures)
+        for future in completed:
+            fixture = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                failures.append((fixture, exc))
+                print(f"FAILED {fixture.output_path}: {exc}", file=sys.stderr)
+            else:
+                finish(fixture, result)
+    return failures
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Build the Matterhorn fixture corpus in a single interpreter.",
+    )
+    parser.add_argument(
+        "-r",
+        "--rule",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="only build fixtures whose rule ID matches PATTERN, e.g. '7.21.*' "
+        "(may be repeated)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        "--dry-run",
+        dest="list_only",
+        action="store_true",
+        help="list the selected fixtures without building them",
+    )
+    parser.add_argument(
+        "--stress",
+        action="store_true",
+        help="also build the generators' STRESS_FIXTURES parameterizations",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="rebuild fixtures even if the build manifest says they are up to date",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=build_cache.MANIFEST_PATH,
+        help=f"build manifest location (default: {build_cache.MANIFEST_PATH})",
+    )
+    parser.add_argument(
+        "--incremental",
+        choices=("full", "delta"),
+        help="write fail variants as incremental updates appended to their pass "
+        "document ('full'), or write only the appended update as <name>.delta",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=(*SAVE_PROFILE_NAMES, "matrix"),
+        help="save every fixture with this serialization profile: 'compact' (object "
+        "and xref streams, Flate level 9), 'classic' (xref table, uncompressed "
+        "streams), 'linearized', or 'matrix' to write each fixture in every profile "
+        f"under {PROFILES_DIR}/<profile>/",
+    )
+    parser.add_argument(
+        "--dedup",
+        nargs="?",
+        const="hardlink",
+        choices=("hardlink", "reflink"),
+        help="store each distinct output once in the content-addressed blob store "
+        "under output/.blobs and link the fixture paths to it (default: hardlink; "
+        "falls back to copying where links are unsupported)",
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="PATH",
+        help="stream every fixture into one archive instead of writing files: "
+        "PATH ending in .tar, .tar.zst (needs zstandard) or .zip, or '-' for "
+        "stdout (progress then goes to stderr); the build manifest is not used",
+    )
+    parser.add_argument(
+        "--archive-index",
+        type=Path,
+        metavar="PATH",
+        help="where to write the member offset index (default: <archive>.index.json; "
+        "none for stdout)",
+    )
+    parser.add_argument(
+        "--archive-format",
+        choices=ARCHIVE_FORMATS,
+        help="archive format when it cannot be inferred from PATH",
+    )
+    parser.add_argument(
+        "--telemetry",
+        type=Path,
+        metavar="PATH",
+        help="append per-phase build events (durations, bytes, object counts; "
+        "tracemalloc peaks when PYTHONTRACEMALLOC is set) to PATH as JSON lines",
+    )
+    args = parser.parse_args(argv)
+    if args.archive:
+        if args.incremental or args.dedup:
+            parser.error("--archive cannot be combined with --incremental or --dedup")
+        if args.archive_format is None:
+            args.archive_format = (
+                "tar" if args.archive == "-" else archive_format_for(Path(args.archive))
+            )
+        if args.archive_format == "tar.zst" and importlib.util.find_spec("zstandard") is None:
+            parser.error("tar.zst archives need the optional 'zstandard' package")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    fixtures = select_fixtures(discover_fixtures(stress=args.stress), args.rule)
+    if args.profile:
+        fixtures = with_profiles(fixtures, args.profile)
+
+    if args.list_only:
+        for fixture in fixtures:
+            profile = f"{fixture.profile:<11}" if args.profile else ""
+            print(
+                f"{fixture.rule:<12} {fixture.variant:<5} {profile}"
+                f"{fixture.module}  {fixture.output_path}"
+            )
+        return 0
+
+    if args.telemetry:
+        # Read by telemetry when the generators are first imported.
+        os.environ["FIXTURE_TELEMETRY"] = str(args.telemetry.resolve())
+
+    start = time.perf_counter()
+    if args.incremental:
+        fixtures = as_incremental_updates(fixtures, args.incremental == "delta")
+
+    archive = None
+    if args.archive:
+        if args.archive == "-":
+            archive_stream = sys.stdout.buffer
+            sys.stdout = sys.stderr
+        else:
+            Path(args.archive).parent.mkdir(parents=True, exist_ok=True)
+            archive_stream = open(args.archive, "wb")
+        archive = ArchiveWriter(archive_stream, args.archive_format)
+
+    entries = build_cache.load_manifest(args.manifest)
+    keys = {}
+    for fixture in sorted(fixtures, key=lambda fixture: fixture.update_of is not None):
+        params = fixture.params
+        if fixture.profile is not None:
+            params = {**params, "profile": fixture.profile}
+        if fixture.update_of is not None:
+            params = {
+                **params,
+                "update_of": keys[fixture.update_of],
+                "delta_only": fixture.delta_only,
+            }
+        keys[fixture.output_path] = build_cache.fixture_key(fixture.module, params)
+    companions = {fixture.output_path: companion_outputs(fixture) for fixture in fixtures}
+    stale = [
+        fixture
+        for fixture in fixtures
+        if args.force
+        or archive is not None
+        or not build_cache.is_up_to_date(
+            entries,
+            fixture.output_path,
+            keys[fixture.output_path],
+            companions[fixture.output_path],
+        )
+    ]
+
+    totals: dict[str | None, list] = {}
+
+    def record(fixture: Fixture, elapsed: float) -> None:
+        total = totals.setdefault(fixture.profile, [0, 0, 0.0])
+        total[0] += 1
+        total[2] += elapsed
+        if archive is not None:
+            total[1] += archive.index[fixture.output_path.as_posix().lstrip("/")]["size"]
+            return
+        # Recorded as each fixture lands, so an interrupted run resumes here.
+        build_cache.record_build(
+            entries,
+            fixture.output_path,
+            keys[fixture.output_path],
+            args.manifest,
+            companions[fixture.output_path],
+        )
+        total[1] += fixture.output_path.stat().st_size
+
+    # Incremental updates are appended to pass documents, so those are
+    # written first.
+    failures = run_fixtures(
+        [fixture for fixture in stale if fixture.update_of is None],
+        args.jobs,
+        on_success=record,
+        dedup=args.dedup,
+        archive=archive,
+    )
+    failures += run_fixtures(
+        [fixture for fixture in stale if fixture.update_of is not None],
+        args.jobs,
+        on_success=record,
+        dedup=args.dedup,
+    )
+    if archive is None:
+        build_cache.compact_manifest(entries, args.manifest)
+    else:
+        archive.close()
+        if args.archive == "-":
+            archive_stream.flush()
+        else:
+            archive_stream.close()
+        index_path = args.archive_index
+        if index_path is None and args.archive != "-":
+            index_path = Path(args.archive + ".index.json")
+        if index_path is not None:
+            archive.write_index(index_path)
+        print(f"archived {len(archive.index)} members to {args.archive}")
+    if args.profile:
+        print(f"{'profile':<11} {'fixtures':>8} {'bytes':>12} {'build ms':>10}")
+        for profile, (count, size, seconds) in sorted(totals.items()):
+            print(f"{profile:<11} {count:>8} {size:>12} {seconds * 1000:>10.1f}")
+    if args.dedup:
+        outputs, requested, stored = BlobStore().report()
+        print(
+            f"blob store: {outputs} outputs, {requested} bytes requested, "
+            f"{stored} bytes stored, {requested - stored} bytes saved"
+        )
+    elapsed = time.perf_counter() - start
+    print(
+        f"built {len(stale) - len(failures)}/{len(stale)} fixtures "
+        f"({len(fixtures) - len(stale)} up to date) "
+        f"in {elapsed:.2f} s with {max(args.jobs, 1)} job(s)"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
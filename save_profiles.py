@@ -0,0 +1,78 @@
+import io
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+import pikepdf
+
+from output_store import has_backend, write_output
+from telemetry import phase
+
+
+# Options applied on top of each generator's own save call. "compact" also
+# raises the Flate level to 9 for the duration of the save.
+SAVE_PROFILES = {
+    "compact": {
+        "object_stream_mode": pikepdf.ObjectStreamMode.generate,
+        "compress_streams": True,
+        "recompress_flate": True,
+        "deterministic_id": True,
+    },
+    "classic": {
+        "object_stream_mode": pikepdf.ObjectStreamMode.disable,
+        "compress_streams": False,
+        "stream_decode_level": pikepdf.StreamDecodeLevel.generalized,
+        "deterministic_id": True,
+    },
+    "linearized": {
+        "linearize": True,
+        "deterministic_id": True,
+    },
+}
+MAX_FLATE_LEVEL = 9
+# qpdf's default, which pikepdf cannot report back.
+DEFAULT_FLATE_LEVEL = -1
+
+_active_profile: str | None = None
+
+
+@contextmanager
+def active_profile(profile: str | None) -> Iterator[None]:
+    global _active_profile
+    if profile is not None and profile not in SAVE_PROFILES:
+        raise ValueError(f"unknown save profile {profile!r}")
+    previous, _active_profile = _active_profile, profile
+    try:
+        yield
+    finally:
+        _active_profile = previous
+
+
+def save_pdf(pdf: pikepdf.Pdf, output: Path | BinaryIO, **options) -> None:
+    # Every save is reproducible unless the caller says otherwise: the build
+    # manifest, blob store and archives all rely on identical bytes.
+    options.setdefault("deterministic_id", True)
+    profile = _active_profile
+    if profile is not None:
+        options = {**options, **SAVE_PROFILES[profile]}
+    with phase("save", pdf, output=str(output), profile=profile) as event:
+        if profile == "compact":
+            pikepdf.settings.set_flate_compression_level(MAX_FLATE_LEVEL)
+        try:
+            if isinstance(output, Path) and has_backend():
+                # Output backends take the finished bytes rather than a path.
+                buffer = io.BytesIO()
+                pdf.save(buffer, **options)
+                write_output(output, buffer.getvalue())
+                event["bytes"] = buffer.tell()
+            elif isinstance(output, Path):
+                output.parent.mkdir(parents=True, exist_ok=True)
+                pdf.save(output, **options)
+                event["bytes"] = output.stat().st_size
+            else:
+                pdf.save(output, **options)
+                event["bytes"] = output.tell()
+        finally:
+            if profile == "compact":
+                pikepdf.settings.set_flate_compression_level(DEFAULT_FLATE_LEVEL)
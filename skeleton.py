@@ -0,0 +1,49 @@
+import io
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+import pikepdf
+
+from telemetry import phase
+
+
+# Upper bound on serialized skeletons kept per process; least recently used
+# entries are evicted first.
+MAX_SKELETONS = 32
+
+_skeletons: OrderedDict[Hashable, bytes] = OrderedDict()
+
+
+def skeleton_bytes(key: Hashable, build: Callable[[pikepdf.Pdf], None]) -> bytes:
+    if key in _skeletons:
+        _skeletons.move_to_end(key)
+        return _skeletons[key]
+    with phase("skeleton", key=repr(key)) as event:
+        pdf = pikepdf.Pdf.new()
+        build(pdf)
+        buffer = io.BytesIO()
+        # Streams stay as built so the variant's own save decides how they
+        # are compressed, exactly as if it had been built from scratch.
+        # A deterministic /ID too: clones keep its first element.
+        pdf.save(
+            buffer,
+            compress_streams=False,
+            object_stream_mode=pikepdf.ObjectStreamMode.disable,
+            deterministic_id=True,
+        )
+        event["bytes"] = buffer.tell()
+    _skeletons[key] = buffer.getvalue()
+    while len(_skeletons) > MAX_SKELETONS:
+        _skeletons.popitem(last=False)
+    return _skeletons[key]
+
+
+def clone_skeleton(key: Hashable, build: Callable[[pikepdf.Pdf], None]) -> pikepdf.Pdf:
+    # Each clone parses the shared serialized skeleton lazily, so objects the
+    # variant does not touch (embedded fonts in particular) are copied
+    # straight from the buffer at save time.
+    return pikepdf.open(io.BytesIO(skeleton_bytes(key, build)))
+
+
+def clear_cache() -> None:
+    _skeletons.clear()
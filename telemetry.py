@@ -0,0 +1,124 @@
+import functools
+import json
+import os
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import TypeVar
+
+import pikepdf
+
+
+# Path of a JSON-lines file every process appends its events to; set it
+# before the generators are imported (run_corpus --telemetry does).
+TELEMETRY_ENV = "FIXTURE_TELEMETRY"
+
+F = TypeVar("F", bound=Callable)
+
+_sinks: list[Callable[[dict], None]] = []
+_labels: dict = {}
+# Running tracemalloc peak of each open phase, innermost last.
+_peaks: list[int] = []
+
+
+def add_sink(sink: Callable[[dict], None]) -> None:
+    _sinks.append(sink)
+
+
+def remove_sink(sink: Callable[[dict], None]) -> None:
+    _sinks.remove(sink)
+
+
+def json_lines_sink(path: Path) -> Callable[[dict], None]:
+    # One write per event on an O_APPEND handle, so lines from concurrent
+    # worker processes do not interleave.
+    handle = path.open("a", buffering=1)
+
+    def write(event: dict) -> None:
+        handle.write(json.dumps(event, default=str) + "\n")
+
+    return write
+
+
+@contextmanager
+def collect() -> Iterator[list[dict]]:
+    events = []
+    add_sink(events.append)
+    try:
+        yield events
+    finally:
+        remove_sink(events.append)
+
+
+@contextmanager
+def labels(**fields) -> Iterator[None]:
+    # Fields attached to every event emitted inside the block, e.g. the
+    # fixture being built.
+    previous = dict(_labels)
+    _labels.update(fields)
+    try:
+        yield
+    finally:
+        _labels.clear()
+        _labels.update(previous)
+
+
+@contextmanager
+def _phase(name: str, pdf: pikepdf.Pdf | None, fields: dict) -> Iterator[dict]:
+    event = {"event": name, **_labels, **fields, "pid": os.getpid()}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # tracemalloc keeps a single peak, so an enclosing phase's peak so
+        # far is saved before this phase resets it.
+        if _peaks:
+            _peaks[-1] = max(_peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        _peaks.append(0)
+    start = time.perf_counter()
+    try:
+        yield event
+    finally:
+        event["duration_s"] = time.perf_counter() - start
+        if tracing:
+            peak = max(_peaks.pop(), tracemalloc.get_traced_memory()[1])
+            event["tracemalloc_peak"] = peak
+            if _peaks:
+                _peaks[-1] = max(_peaks[-1], peak)
+        if pdf is not None:
+            event["objects"] = len(pdf.objects)
+        for sink in _sinks:
+            sink(event)
+
+
+def phase(name: str, pdf: pikepdf.Pdf | None = None, **fields):
+    # Callers may add fields such as "bytes" to the yielded event. With no
+    # sink registered this is a bare nullcontext.
+    if not _sinks:
+        return nullcontext({})
+    return _phase(name, pdf, fields)
+
+
+def instrumented(name: str) -> Callable[[F], F]:
+    # Emits a phase event per call. The first pikepdf.Pdf argument, if any,
+    # supplies the indirect-object count; bytes results supply "bytes".
+    def decorate(function: F) -> F:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return function(*args, **kwargs)
+            pdf = next((arg for arg in args if isinstance(arg, pikepdf.Pdf)), None)
+            with _phase(name, pdf, {"function": function.__qualname__}) as event:
+                result = function(*args, **kwargs)
+                if isinstance(result, (bytes, bytearray)):
+                    event["bytes"] = len(result)
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+if os.environ.get(TELEMETRY_ENV):
+    add_sink(json_lines_sink(Path(os.environ[TELEMETRY_ENV])))
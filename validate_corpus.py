@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import re
+import shlex
+import signal
+import statistics
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from run_corpus import FIXTURE_NAME_RE, ROOT_DIR
+
+
+OUTPUT_DIR = Path("output")
+# check_fixtures --validate: every oracle over the file, exit 1 on any
+# violation, like a whole-document validator.
+STAND_IN_COMMAND = shlex.join(
+    [sys.executable, str(ROOT_DIR / "check_fixtures.py"), "--validate", "{path}"]
+)
+DEFAULT_TIMEOUT_S = 60.0
+PERCENTILES = (50, 90, 99)
+VERDICTS = ("pass", "fail", "timeout", "error")
+
+
+@dataclass
+class ValidatorResult:
+    path: str
+    rule: str
+    expected: str
+    verdict: str
+    returncode: int | None
+    latency_s: float
+
+
+def find_fixtures(paths: list[Path]) -> list[Path]:
+    found = []
+    for path in paths:
+        candidates = sorted(path.rglob("*.pdf")) if path.is_dir() else [path]
+        found.extend(
+            candidate for candidate in candidates if FIXTURE_NAME_RE.match(candidate.name)
+        )
+    return found
+
+
+def validator_argv(command: str, path: Path) -> list[str]:
+    argv = [argument.replace("{path}", str(path)) for argument in shlex.split(command)]
+    return argv if "{path}" in command else [*argv, str(path)]
+
+
+def interpret(
+    returncode: int,
+    output: bytes,
+    fail_codes: set[int],
+    fail_pattern: re.Pattern | None,
+) -> str:
+    # With a pattern the verdict comes from the validator's output (any
+    # exit code but a crash counts); otherwise from its exit code alone.
+    if returncode < 0:
+        return "error"
+    if fail_pattern is not None:
+        return "fail" if fail_pattern.search(output) else "pass"
+    if returncode in fail_codes:
+        return "fail"
+    return "pass" if returncode == 0 else "error"
+
+
+async def validate(
+    path: Path,
+    command: str,
+    timeout: float,
+    limit: asyncio.Semaphore,
+    fail_codes: set[int],
+    fail_pattern: re.Pattern | None,
+) -> ValidatorResult:
+    match = FIXTURE_NAME_RE.match(path.name)
+    async with limit:
+        start = time.perf_counter()
+        returncode = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *validator_argv(command, path),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+            )
+        except OSError:
+            verdict = "error"
+        else:
+            try:
+                output, _ = await asyncio.wait_for(process.communicate(), timeout)
+            except TimeoutError:
+                # The whole process group, so children of a wrapper script
+                # (a JVM under a shell launcher, say) cannot keep the
+                # output pipe open.
+                os.killpg(process.pid, signal.SIGKILL)
+                await process.wait()
+                verdict = "timeout"
+            else:
+                returncode = process.returncode
+                verdict = interpret(returncode, output, fail_codes, fail_pattern)
+        latency = time.perf_counter() - start
+    return ValidatorResult(str(path), match["rule"], match["variant"], verdict, returncode, latency)
+
+
+async def validate_all(
+    paths: list[Path],
+    command: str,
+    jobs: int,
+    timeout: float,
+    fail_codes: set[int],
+    fail_pattern: re.Pattern | None,
+) -> list[ValidatorResult]:
+    limit = asyncio.Semaphore(max(jobs, 1))
+    tasks = [
+        asyncio.create_task(validate(path, command, timeout, limit, fail_codes, fail_pattern))
+        for path in paths
+    ]
+    results = []
+    for task in asyncio.as_completed(tasks):
+        result = await task
+        if result.verdict != result.expected:
+            print(f"{result.verdict.upper():<8} {result.path} (expected {result.expected})")
+        results.append(result)
+    return sorted(results, key=lambda result: result.path)
+
+
+def confusion_matrix(results: list[ValidatorResult]) -> dict[str, Counter]:
+    # Per checkpoint: (expected, verdict) counts.
+    matrix: dict[str, Counter] = {}
+    for result in results:
+        matrix.setdefault(result.rule, Counter())[result.expected, result.verdict] += 1
+    return matrix
+
+
+def latency_percentiles(results: list[ValidatorResult]) -> dict[str, float]:
+    latencies = sorted(result.latency_s for result in results)
+    if len(latencies) < 2:
+        cuts = latencies * 99
+    else:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    summary = {f"p{percentile}": cuts[percentile - 1] for percentile in PERCENTILES}
+    summary["max"] = latencies[-1]
+    return summary
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run a validator over the fixtures and score it against their pass/fail names.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        type=Path,
+        default=[OUTPUT_DIR],
+        help="fixture files or directories to scan (default: output/)",
+    )
+    parser.add_argument(
+        "-c",
+        "--command",
+        default=STAND_IN_COMMAND,
+        help="validator command line; {path} is replaced by the fixture (appended "
+        "when absent). Default: the check_fixtures oracles as a stand-in",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="validator processes run at once (default: CPU count)",
+    )
+    parser.add_argument(
+        "-t",
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT_S,
+        help=f"seconds before a validator run is killed (default: {DEFAULT_TIMEOUT_S:g})",
+    )
+    parser.add_argument(
+        "--fail-exit-code",
+        type=int,
+        action="append",
+        metavar="CODE",
+        help="exit code meaning the file is not compliant (may be repeated; default: 1); "
+        "0 means compliant and any other code is an error",
+    )
+    parser.add_argument(
+        "--fail-pattern",
+        metavar="REGEX",
+        help="decide the verdict from the validator's output instead: non-compliant "
+        "when REGEX matches stdout or stderr",
+    )
+    parser.add_argument(
+        "--json",
+        type=Path,
+        metavar="PATH",
+        help="also write the per-file results, confusion matrix and latencies to PATH",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    paths = find_fixtures(args.paths)
+    fail_codes = set(args.fail_exit_code or [1])
+    fail_pattern = re.compile(args.fail_pattern.encode()) if args.fail_pattern else None
+
+    start = time.perf_counter()
+    results = asyncio.run(
+        validate_all(paths, args.command, args.jobs, args.timeout, fail_codes, fail_pattern)
+    )
+    elapsed = time.perf_counter() - start
+    if not results:
+        print("no fixtures found", file=sys.stderr)
+        return 1
+
+    matrix = confusion_matrix(results)
+    print(
+        f"{'rule':<12} {'fail->fail':>10} {'fail->pass':>10} {'pass->pass':>10} "
+        f"{'pass->fail':>10} {'timeout':>8} {'error':>8}"
+    )
+    for rule, counts in sorted(matrix.items()):
+        timeouts = counts["pass", "timeout"] + counts["fail", "timeout"]
+        errors = counts["pass", "error"] + counts["fail", "error"]
+        print(
+            f"{rule:<12} {counts['fail', 'fail']:>10} {counts['fail', 'pass']:>10} "
+            f"{counts['pass', 'pass']:>10} {counts['pass', 'fail']:>10} {timeouts:>8} {errors:>8}"
+        )
+    percentiles = latency_percentiles(results)
+    print(
+        "latency "
+        + " ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in percentiles.items())
+    )
+    wrong = sum(result.verdict != result.expected for result in results)
+    print(
+        f"validated {len(results)} fixtures in {elapsed:.2f} s "
+        f"({len(results) / elapsed:.1f} files/s, {max(args.jobs, 1)} at once), {wrong} wrong"
+    )
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "command": args.command,
+            "jobs": args.jobs,
+            "elapsed_s": elapsed,
+            "latency_s": percentiles,
+            "confusion": {
+                rule: {
+                    expected: {verdict: counts[expected, verdict] for verdict in VERDICTS}
+                    for expected in ("pass", "fail")
+                }
+                for rule, counts in sorted(matrix.items())
+            },
+            "results": [asdict(result) for result in results],
+        }
+        args.json.write_text(json.dumps(report, indent=1) + "\n")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())